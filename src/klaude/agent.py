@@ -27,7 +27,7 @@ from .tools_impl import (
     TaskTool, BashTool, GlobTool, GrepTool, LSTool, 
     ReadTool, EditTool, MultiEditTool, 
     WriteTool, NotebookReadTool, NotebookEditTool, 
-    WebFetchTool, TodoWriteTool, WebSearchTool
+    WebFetchTool, TodoWriteTool, WebSearchTool, flush_pending_writes
 )
 
 # Load .env file
@@ -452,6 +452,8 @@ assistant: Clients are marked as failed in the `connectToServer` function in src
             
             # Check if we should continue or stop
             if response.choices[0].finish_reason == "stop":
+                # Control returns to the user; put any debounced edits on disk
+                flush_pending_writes()
                 break
             elif response.choices[0].finish_reason != "tool_calls":
                 self.console.print(f"[red]Unexpected finish_reason: {response.choices[0].finish_reason}[/red]")
@@ -10,8 +10,10 @@ This file is part of the klaude project.
 
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 import json
 
 
@@ -39,6 +41,57 @@ class AgentConfig:
         }
 
 
+# Directories with fewer agent files than this are parsed sequentially
+_PARALLEL_PARSE_MIN = 4
+
+
+@lru_cache(maxsize=256)
+def _parse_agent_file_cached(path: str, mtime_ns: int, size: int) -> Optional[AgentConfig]:
+    """Parse an agent configuration file.
+    
+    Every TaskTool builds its own AgentConfigLoader, so the same files are
+    loaded many times per process. The modification time and size are part
+    of the key, so an edited file is parsed again. The returned config is
+    shared between loaders and must not be modified.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # Split by the header delimiter
+    parts = content.split('---', 2)
+    if len(parts) < 3:
+        return None
+    
+    # Parse the header section
+    header = parts[1].strip()
+    system_prompt = parts[2].strip()
+    
+    # Extract fields from header
+    config_data = {}
+    for line in header.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            config_data[key.strip()] = value.strip()
+    
+    # Validate required fields
+    if 'name' not in config_data or 'description' not in config_data:
+        return None
+    
+    # Parse tools list
+    tools = []
+    if 'tools' in config_data:
+        tools = [t.strip() for t in config_data['tools'].split(',')]
+    
+    return AgentConfig(
+        name=config_data['name'],
+        description=config_data['description'],
+        tools=tools,
+        system_prompt=system_prompt,
+        model=config_data.get('model', 'inherit'),
+        color=config_data.get('color', 'default')
+    )
+
+
 class AgentConfigLoader:
     """Loads custom agent configurations from files"""
     
@@ -60,53 +113,35 @@ class AgentConfigLoader:
     
     def _load_agents_from_directory(self, directory: Path):
         """Load all agent configurations from a directory"""
-        for file_path in directory.glob("*.md"):
+        with os.scandir(directory) as entries:
+            file_paths = [entry.path for entry in entries
+                          if entry.name.endswith('.md') and entry.is_file()]
+        
+        def parse(file_path: str):
             try:
-                config = self._parse_agent_file(file_path)
-                if config:
-                    # Project configs override global configs with same name
-                    self.agents[config.name] = config
+                return self._parse_agent_file(file_path), None
             except Exception as e:
-                print(f"Error loading agent config from {file_path}: {e}")
-    
-    def _parse_agent_file(self, file_path: Path) -> Optional[AgentConfig]:
-        """Parse a single agent configuration file"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Split by the header delimiter
-        parts = content.split('---', 2)
-        if len(parts) < 3:
-            return None
+                return None, e
         
-        # Parse the header section
-        header = parts[1].strip()
-        system_prompt = parts[2].strip()
+        # Reading the files dominates, so larger directories are read in
+        # parallel; results are applied in order on this thread
+        if len(file_paths) < _PARALLEL_PARSE_MIN:
+            results = map(parse, file_paths)
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(file_paths))) as executor:
+                results = list(executor.map(parse, file_paths))
         
-        # Extract fields from header
-        config_data = {}
-        for line in header.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                config_data[key.strip()] = value.strip()
-        
-        # Validate required fields
-        if 'name' not in config_data or 'description' not in config_data:
-            return None
-        
-        # Parse tools list
-        tools = []
-        if 'tools' in config_data:
-            tools = [t.strip() for t in config_data['tools'].split(',')]
-        
-        return AgentConfig(
-            name=config_data['name'],
-            description=config_data['description'],
-            tools=tools,
-            system_prompt=system_prompt,
-            model=config_data.get('model', 'inherit'),
-            color=config_data.get('color', 'default')
-        )
+        for file_path, (config, error) in zip(file_paths, results):
+            if error is not None:
+                print(f"Error loading agent config from {file_path}: {error}")
+            elif config:
+                # Project configs override global configs with same name
+                self.agents[config.name] = config
+    
+    def _parse_agent_file(self, file_path: Union[str, Path]) -> Optional[AgentConfig]:
+        """Parse a single agent configuration file"""
+        st = os.stat(file_path)
+        return _parse_agent_file_cached(str(file_path), st.st_mtime_ns, st.st_size)
     
     def get_agent(self, name: str) -> Optional[AgentConfig]:
         """Get an agent configuration by name"""
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+File: streaming_args.py
+Author: Claude Code Assistant
+Created: 2026-10-15
+Description: Incremental parser for tool-call arguments streamed as JSON deltas
+
+This file is part of the klaude project.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+class IncrementalJsonParser:
+    """Tracks the structure of a JSON object as it arrives in chunks.
+
+    Each character is scanned exactly once, in feed(), so the total cost is
+    linear in the argument size instead of re-parsing the whole buffer on
+    every delta. The parser remembers the last point where the text can be
+    closed into valid JSON (after an opening bracket, before a comma, after
+    a closing bracket), which lets snapshot() return the members received
+    so far while the object is still incomplete.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._length = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._complete = False
+        # (offset, open brackets) of the last point the text can be closed at
+        self._safe_end = 0
+        self._safe_stack: List[str] = []
+
+    @property
+    def complete(self) -> bool:
+        """True once the top-level object has been closed"""
+        return self._complete
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next piece of the argument string"""
+        if self._complete:
+            if chunk.strip():
+                raise ValueError("Data after the end of the JSON object")
+            return
+
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        stack = self._stack
+        for i, char in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if not self._started:
+                    if char != '{':
+                        raise ValueError("Tool arguments must be a JSON object")
+                    self._started = True
+                stack.append(char)
+                self._mark(i + 1)
+            elif char in '}]':
+                if not stack or _CLOSERS[stack.pop()] != char:
+                    raise ValueError(f"Unbalanced '{char}' at offset {i}")
+                self._mark(i + 1)
+                if not stack:
+                    self._complete = True
+                    if chunk[i + 1:].strip():
+                        raise ValueError("Data after the end of the JSON object")
+                    return
+            elif char == ',':
+                self._mark(i)
+            elif not self._started and not char.isspace():
+                raise ValueError("Tool arguments must be a JSON object")
+
+    def _mark(self, offset: int) -> None:
+        self._safe_end = offset
+        self._safe_stack = list(self._stack)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the arguments parsed so far.
+
+        For a complete object this is the full result; otherwise it holds
+        the members whose values have been fully received, with any open
+        objects and arrays closed.
+        """
+        if self._complete:
+            return json.loads(self.text)
+        if not self._started:
+            return {}
+        closers = ''.join(_CLOSERS[b] for b in reversed(self._safe_stack))
+        return json.loads(self.text[:self._safe_end] + closers)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Return the parsed arguments once complete, else None"""
+        return self.snapshot() if self._complete else None
@@ -47,24 +47,37 @@ class ToolRegistry:
     
     def __init__(self):
         self.tools: Dict[str, ToolBase] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
     
     def register(self, tool: ToolBase):
         """Register a tool"""
         self.tools[tool.name] = tool
+        self._schemas = None
     
     def get_tool(self, name: str) -> Optional[ToolBase]:
         """Get a tool by name"""
         return self.tools.get(name)
     
     def get_all_schemas(self) -> List[Dict[str, Any]]:
-        """Get schemas for all registered tools"""
-        return [tool.to_function_schema() for tool in self.tools.values()]
+        """Get schemas for all registered tools.
+
+        The list is sent with every completion request and only changes when
+        a tool is registered, so it is built once and reused.
+        """
+        if self._schemas is None:
+            self._schemas = [tool.to_function_schema() for tool in self.tools.values()]
+        return self._schemas
     
     def execute_tool(self, name: str, **kwargs) -> str:
         """Execute a tool by name"""
         tool = self.get_tool(name)
         if not tool:
             raise ValueError(f"Tool '{name}' not found")
+        if name != "NotebookEdit":
+            # NotebookEdit may hold a burst of edits in memory; put them on
+            # disk before any other tool can read or change the file
+            from .tools_impl import flush_pending_writes
+            flush_pending_writes()
         return tool.execute(**kwargs)
 
 
@@ -16,14 +16,24 @@ import re
 import glob
 import fnmatch
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Union
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import ast
+import atexit
 import shutil
 import tempfile
 import time
-from collections import defaultdict
+import heapq
+import mmap
+import queue
+import shlex
+import signal
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urlsplit
 import requests
 import markdownify
 from dotenv import load_dotenv
@@ -32,10 +42,42 @@ import uuid
 from .tool_base import ToolBase, create_json_schema, create_property_schema, ToolRegistry
 from .agent_config import AgentConfigLoader
 
+# orjson is an optional speedup for parsing large notebooks; both accept bytes.
+# Notebooks are still written with json, since orjson can't produce the
+# indent=1 layout Jupyter uses and rewriting every line would bloat diffs.
+try:
+    import orjson
+    _JSON_LOADS = orjson.loads
+except ImportError:
+    _JSON_LOADS = json.loads
+
+# pathspec is optional; without it .gitignore files are not read
+try:
+    import pathspec
+except ImportError:
+    pathspec = None
+
+# ijson is optional; with it a single notebook cell is read without parsing
+# the rest of the notebook
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
 
+_TASK_SCHEMA = create_json_schema(
+    properties={
+        "description": create_property_schema("string", "A short (3-5 word) description of the task"),
+        "prompt": create_property_schema("string", "The task for the agent to perform"),
+        "subagent_type": create_property_schema("string", "The type of specialized agent to use for this task")
+    },
+    required=["description", "prompt", "subagent_type"]
+)
+
+
 class TaskTool(ToolBase):
     """Launch a new agent to handle complex tasks"""
     
@@ -94,14 +136,7 @@ class TaskTool(ToolBase):
             raise e
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "description": create_property_schema("string", "A short (3-5 word) description of the task"),
-                "prompt": create_property_schema("string", "The task for the agent to perform"),
-                "subagent_type": create_property_schema("string", "The type of specialized agent to use for this task")
-            },
-            required=["description", "prompt", "subagent_type"]
-        )
+        return _TASK_SCHEMA
     
     def _build_description(self) -> str:
         """Build the tool description including custom agents"""
@@ -312,6 +347,27 @@ assistant: "I'm going to use the Task tool to launch the with the greeting-respo
             }, ensure_ascii=False)
 
 
+_BASH_SCHEMA = create_json_schema(
+    properties={
+        "command": create_property_schema("string", "The command to execute"),
+        "timeout": create_property_schema("number", "Optional timeout in milliseconds (max 600000)"),
+        "description": create_property_schema("string", """ Clear, concise description of what this command does in 5-10 words. Examples:
+Input: ls
+Output: Lists files in current directory
+
+Input: git status
+Output: Shows working tree status
+
+Input: npm install
+Output: Installs package dependencies
+
+Input: mkdir foo
+Output: Creates directory 'foo'""")
+    },
+    required=["command"]
+)
+
+
 class BashTool(ToolBase):
     """Execute bash commands"""
     
@@ -434,59 +490,245 @@ Important:
         )
         self.shell_env = os.environ.copy()
         self.cwd = os.getcwd()
+        self._shell: Optional[subprocess.Popen] = None
+        self._lines: Optional["queue.Queue[Optional[str]]"] = None
+        self._stderr_path: Optional[str] = None
+        self._sentinel = f"__KLAUDE_DONE_{uuid.uuid4().hex}__"
+        self._lock = threading.Lock()
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "command": create_property_schema("string", "The command to execute"),
-                "timeout": create_property_schema("number", "Optional timeout in milliseconds (max 600000)"),
-                "description": create_property_schema("string", """ Clear, concise description of what this command does in 5-10 words. Examples:
-Input: ls
-Output: Lists files in current directory
-
-Input: git status
-Output: Shows working tree status
-
-Input: npm install
-Output: Installs package dependencies
-
-Input: mkdir foo
-Output: Creates directory 'foo'""")
-            },
-            required=["command"]
-        )
+        return _BASH_SCHEMA
     
     def execute(self, command: str, timeout: Optional[int] = None, description: Optional[str] = None) -> str:
+        timeout_seconds = (timeout / 1000) if timeout else 120
         try:
-            timeout_seconds = (timeout / 1000) if timeout else 120
-            
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout_seconds,
-                cwd=self.cwd,
-                env=self.shell_env
-            )
+            with self._lock:
+                result = self._run(command, timeout_seconds)
+            if result is None:
+                return f"Command timed out after {timeout_seconds} seconds"
+            stdout, stderr, returncode = result
             
             output = ""
-            if result.stdout:
-                output += result.stdout
-            if result.stderr:
+            if stdout:
+                output += stdout
+            if stderr:
                 if output:
                     output += "\n"
-                output += result.stderr
+                output += stderr
             
-            if result.returncode != 0 and not output:
-                output = f"Command failed with return code {result.returncode}"
+            if returncode != 0 and not output:
+                output = f"Command failed with return code {returncode}"
             
             return output or "Command executed successfully with no output"
             
-        except subprocess.TimeoutExpired:
-            return f"Command timed out after {timeout_seconds} seconds"
         except Exception as e:
             return f"Error executing command: {str(e)}"
+    
+    def _start_shell(self) -> None:
+        """Start the persistent bash process and the thread that reads its stdout"""
+        fd, self._stderr_path = tempfile.mkstemp(prefix="klaude-bash-", suffix=".err")
+        os.close(fd)
+        # A new session lets a timeout kill the shell together with its children
+        self._shell = subprocess.Popen(
+            ["bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            cwd=self.cwd,
+            env=self.shell_env,
+            start_new_session=True
+        )
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        
+        def pump(stdout) -> None:
+            with stdout:
+                for line in stdout:
+                    lines.put(line)
+            lines.put(None)  # EOF: the shell exited
+        
+        threading.Thread(target=pump, args=(self._shell.stdout,), daemon=True).start()
+        self._lines = lines
+    
+    def _run(self, command: str, timeout_seconds: float) -> Optional[Tuple[str, str, int]]:
+        """Run command in the persistent shell; returns (stdout, stderr, returncode), or None on timeout"""
+        if self._shell is None or self._shell.poll() is not None:
+            self.close()
+            self._start_shell()
+        
+        # eval keeps a syntax error in command from swallowing the sentinel,
+        # and stdin is detached so the command can't read the script stream
+        script = (
+            f"{{ eval {shlex.quote(command)}; }} </dev/null 2>{shlex.quote(self._stderr_path)}\n"
+            f"printf '\\n%s %d\\n' {self._sentinel} $?\n"
+        )
+        self._shell.stdin.write(script)
+        self._shell.stdin.flush()
+        
+        deadline = time.monotonic() + timeout_seconds
+        chunks = []
+        returncode = None
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                self.close()
+                return None
+            if line is None:
+                # The command exited the shell; a fresh one starts next call
+                returncode = self._shell.wait()
+                break
+            if line.startswith(self._sentinel):
+                returncode = int(line.split()[1])
+                # Drop the newline printf put in front of the sentinel
+                chunks[-1] = chunks[-1][:-1]
+                break
+            chunks.append(line)
+        
+        with open(self._stderr_path, encoding='utf-8', errors='replace') as f:
+            stderr = f.read()
+        if self._shell.poll() is not None:
+            self.close()
+        return ''.join(chunks), stderr, returncode
+    
+    def close(self) -> None:
+        """Terminate the persistent shell, if running"""
+        shell, self._shell = self._shell, None
+        if shell is not None:
+            if shell.poll() is None:
+                try:
+                    os.killpg(shell.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            shell.wait()
+            # stdout belongs to the reader thread, which closes it at EOF
+            try:
+                shell.stdin.close()
+            except OSError:
+                pass
+        if self._stderr_path is not None:
+            try:
+                os.unlink(self._stderr_path)
+            except OSError:
+                pass
+            self._stderr_path = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# Directories skipped by walks when .gitignore rules can't be read
+_DEFAULT_IGNORED_DIRS = frozenset({".git", "node_modules", ".venv", "__pycache__", "dist", "build"})
+
+
+def _load_gitignore(root: Union[str, Path]) -> Callable[[str], bool]:
+    """Return a predicate telling whether a directory path under root is ignored.
+    
+    With pathspec installed, the rules come from the .gitignore files in
+    root and its ancestors up to the repository root, each matched relative
+    to its own directory. Without it, a fixed set of well-known VCS,
+    dependency, cache and build directories is ignored. .git is always
+    ignored.
+    """
+    if pathspec is None:
+        return lambda path: os.path.basename(path) in _DEFAULT_IGNORED_DIRS
+    
+    specs = []
+    directory = os.path.abspath(root)
+    while True:
+        try:
+            with open(os.path.join(directory, ".gitignore"), encoding='utf-8', errors='replace') as f:
+                specs.append((directory, pathspec.PathSpec.from_lines("gitwildmatch", f)))
+        except OSError:
+            pass
+        parent = os.path.dirname(directory)
+        if parent == directory or os.path.isdir(os.path.join(directory, ".git")):
+            break
+        directory = parent
+    
+    def ignored(path: str) -> bool:
+        if os.path.basename(path) == ".git":
+            return True
+        path = os.path.abspath(path)
+        return any(spec.match_file(os.path.relpath(path, base) + "/") for base, spec in specs)
+    
+    return ignored
+
+
+# Characters that make a path component a pattern rather than a literal name
+_GLOB_MAGIC = re.compile(r'[*?[]').search
+
+
+def _walk(root: Union[str, Path], pattern: str,
+          skip_dir: Optional[Callable[[str], bool]] = None) -> Iterator[os.DirEntry]:
+    """Recursively yield the entries under root that match pattern, like Path.rglob.
+    
+    Uses os.scandir so each entry's type and stat information come from the
+    DirEntry (and are cached on it) instead of separate syscalls. The
+    trailing components of an entry's relative path must match the
+    '/'-separated parts of pattern. Symlinked directories are not followed,
+    nor are directories for which skip_dir(path) returns True.
+    """
+    matchers = [re.compile(fnmatch.translate(part)).match for part in pattern.split('/') if part]
+    depth = len(matchers)
+    stack = [(os.fspath(root), ())]
+    while stack:
+        dir_path, parents = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            rel = parents + (entry.name,)
+            if len(rel) >= depth and all(m(name) for m, name in zip(matchers, rel[-depth:])):
+                yield entry
+            if entry.is_dir(follow_symlinks=False) and not (skip_dir and skip_dir(entry.path)):
+                # Only the last depth - 1 components are needed for matching
+                subdirs.append((entry.path, rel[len(rel) - depth + 1:] if depth > 1 else ()))
+        stack.extend(reversed(subdirs))
+
+
+def _bounded_join(lines: Iterable[str], max_bytes: int, count_total: bool = True) -> Tuple[str, int, int]:
+    """Join lines with newlines, keeping as many as fit in max_bytes of UTF-8.
+    
+    Returns (text, used, total): the joined text, the number of lines it
+    holds and the number of lines available. With count_total=False the
+    rest of lines is not consumed once the budget is full, and total is
+    reported as used + 1 in that case.
+    """
+    buf = bytearray()
+    used = 0
+    it = iter(lines)
+    for line in it:
+        data = line.encode('utf-8', 'surrogateescape')
+        if len(buf) + len(data) + (1 if used else 0) > max_bytes:
+            total = used + 1 + (sum(1 for _ in it) if count_total else 0)
+            break
+        if used:
+            buf += b'\n'
+        buf += data
+        used += 1
+    else:
+        total = used
+    return buf.decode('utf-8', 'surrogateescape'), used, total
+
+
+_GLOB_SCHEMA = create_json_schema(
+    properties={
+        "pattern": create_property_schema("string", "The glob pattern to match files against"),
+        "path": create_property_schema("string", """The directory to search in. If not specified, the current working directory will be used. IMPORTANT: Omit this field to use the default directory. DO NOT enter "undefined" or "null" - simply omit it for the default behavior. Must be a valid directory path if provided.""")
+    },
+    required=["pattern"]
+)
 
 
 class GlobTool(ToolBase):
@@ -504,65 +746,75 @@ class GlobTool(ToolBase):
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "pattern": create_property_schema("string", "The glob pattern to match files against"),
-                "path": create_property_schema("string", """The directory to search in. If not specified, the current working directory will be used. IMPORTANT: Omit this field to use the default directory. DO NOT enter "undefined" or "null" - simply omit it for the default behavior. Must be a valid directory path if provided.""")
-            },
-            required=["pattern"]
-        )
+        return _GLOB_SCHEMA
     
     def execute(self, pattern: str, path: Optional[str] = None) -> str:
         try:
             search_path = Path(path) if path else Path.cwd()
             
+            # Matched absolute paths, mapped to their modification time
+            matches: Dict[str, float] = {}
+            ignored = _load_gitignore(search_path)
+            
+            def collect(glob_pattern: str):
+                # Handle ** for recursive matching. Ignored directories are
+                # pruned unless the pattern names them explicitly.
+                if '**' in glob_pattern:
+                    named = set(glob_pattern.split('/'))
+                    def skip_dir(p: str) -> bool:
+                        return os.path.basename(p) not in named and ignored(p)
+                    # Leading literal components (src/ in src/**/*.py) name
+                    # the directory to start from rather than being matched
+                    # against every entry
+                    parts = glob_pattern.split('/')
+                    n = 0
+                    while n < len(parts) - 1 and parts[n] != '**' and not _GLOB_MAGIC(parts[n]):
+                        n += 1
+                    root = search_path / '/'.join(parts[:n]) if n else search_path
+                    tail = '/'.join(parts[n:]).replace('**/', '')
+                    for entry in _walk(root, tail, skip_dir):
+                        matches[os.path.abspath(entry.path)] = entry.stat().st_mtime
+                else:
+                    for p in search_path.glob(glob_pattern):
+                        matches[str(p.absolute())] = p.stat().st_mtime
+            
             # Handle brace expansion {a,b,c} manually
             if '{' in pattern and '}' in pattern:
-                matches = set()
                 # Extract the brace content
-                import re
                 brace_match = re.search(r'{([^}]+)}', pattern)
                 if brace_match:
                     options = brace_match.group(1).split(',')
                     base_pattern = pattern[:brace_match.start()] + '{}' + pattern[brace_match.end():]
                     
                     for option in options:
-                        expanded_pattern = base_pattern.format(option.strip())
-                        # Handle ** for recursive matching
-                        if '**' in expanded_pattern:
-                            matches.update(search_path.rglob(expanded_pattern.replace('**/', '')))
-                        else:
-                            matches.update(search_path.glob(expanded_pattern))
-                matches = list(matches)
+                        collect(base_pattern.format(option.strip()))
             else:
-                # Handle ** for recursive matching
-                if '**' in pattern:
-                    matches = list(search_path.rglob(pattern.replace('**/', '')))
-                else:
-                    matches = list(search_path.glob(pattern))
+                collect(pattern)
             
-            # Sort by modification time (newest first)
-            matches.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-            
-            # Convert to absolute paths
-            result = [str(p.absolute()) for p in matches]
+            # Sort by modification time (newest first). Only about as many paths
+            # as fit in the output budget are needed, so for large result sets
+            # select the newest ones with a heap instead of sorting everything.
+            max_length = 30000
+            total = len(matches)
+            cap = max_length // 80 + 256
+            result = None
+            if total > cap:
+                result = heapq.nlargest(cap, matches, key=matches.__getitem__)
+                # Measured as _bounded_join does: UTF-8 bytes plus separators
+                size = sum(len(p.encode('utf-8', 'surrogateescape')) for p in result) + len(result) - 1
+                if size <= max_length:
+                    # Short paths: the survivors don't fill the budget
+                    result = None
+            if result is None:
+                result = sorted(matches, key=matches.__getitem__, reverse=True)
             
             # Check if output is too long
-            output = '\n'.join(result)
-            max_length = 30000
+            output, used, _ = _bounded_join(result, max_length)
             
-            if len(output) > max_length:
-                # Truncate and add note
-                truncated_results = []
-                current_length = 0
-                for path in result:
-                    if current_length + len(path) + 1 > max_length:
-                        break
-                    truncated_results.append(path)
-                    current_length += len(path) + 1
-                
-                output = '\n'.join(truncated_results)
-                output += f"\n\n[Output truncated: showing {len(truncated_results)} of {len(result)} files]"
+            # Compared with every match found, not just the heap's survivors
+            if used < total:
+                # Truncated; add note
+                output += f"\n\n[Output truncated: showing {used} of {total} files]"
                 output += f"\nTo see all results, use a more specific pattern or search in a subdirectory."
             
             return output
@@ -571,6 +823,213 @@ class GlobTool(ToolBase):
             return f"Error: {str(e)}"
 
 
+_GREP_SCHEMA = create_json_schema(
+    properties={
+        "pattern": create_property_schema("string", "The regular expression pattern to search for in file contents"),
+        "path": create_property_schema("string", "File or directory to search in (rg PATH). Defaults to current working directory."),
+        "glob": create_property_schema("string", """Glob pattern to filter files (e.g. "*.js", "*.{ts,tsx}") - maps to rg --glob"""),
+        "type": create_property_schema("string", "File type to search (rg --type). Common types: js, py, rust, go, java, etc. More efficient than include for standard file types."),
+        "output_mode": create_property_schema("string", """Output mode: "content" shows matching lines (supports -A/-B/-C context, -n line numbers, head_limit), "files_with_matches" shows file paths (supports head_limit), "count" shows match counts (supports head_limit). Defaults to "files_with_matches".""", enum=["content", "files_with_matches", "count"]),
+        "-n": create_property_schema("boolean", """Show line numbers in output (rg -n). Requires output_mode: "content", ignored otherwise."""),
+        "-i": create_property_schema("boolean", "Case insensitive search (rg -i)"),
+        "-A": create_property_schema("number", """Number of lines to show after each match (rg -A). Requires output_mode: "content", ignored otherwise."""),
+        "-B": create_property_schema("number", """Number of lines to show before each match (rg -B). Requires output_mode: "content", ignored otherwise."""),
+        "-C": create_property_schema("number", """Number of lines to show before and after each match (rg -C). Requires output_mode: "content", ignored otherwise."""),
+        "head_limit": create_property_schema("number", """Limit output to first N lines/entries, equivalent to "| head -N". Works across all output modes: content (limits output lines), files_with_matches (limits file paths), count (limits count entries). When unspecified, shows all results from ripgrep."""),
+        "multiline": create_property_schema("boolean", "Enable multiline mode where . matches newlines and patterns can span lines (rg -U --multiline-dotall). Default: false.")
+    },
+    required=["pattern"]
+)
+
+
+_REGEX_METACHARS = frozenset('.^$*+?()[]{}|\\')
+_WORD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+_DROP_METACHARS = str.maketrans(dict.fromkeys(_REGEX_METACHARS))
+
+# Pattern classes used to pick a search strategy
+_LITERAL = "literal"
+_TRIVIAL_CLASS = "trivial_class"
+_REGEX = "regex"
+
+# A single character class or class escape, optionally repeated and anchored
+_TRIVIAL_CLASS_RE = re.compile(r'\^?(?:\[\^?(?:[^\]\\]|\\.)+\]|\\[sSdDwW])[*+?]?\$?')
+
+
+def _pattern_class(pattern: str) -> str:
+    """Classify pattern as _LITERAL (no metacharacters), _TRIVIAL_CLASS (e.g. `[ \\t]$`) or _REGEX"""
+    if len(pattern.translate(_DROP_METACHARS)) == len(pattern):
+        return _LITERAL
+    if _TRIVIAL_CLASS_RE.fullmatch(pattern):
+        return _TRIVIAL_CLASS
+    return _REGEX
+
+
+def _extract_required_literal(pattern: str, min_length: int = 4) -> Optional[str]:
+    """Return the longest run of word characters that every match of pattern must contain.
+    
+    Only top-level runs outside character classes are considered, and the
+    extraction gives up (returns None) on constructs it cannot reason about
+    such as alternation, inline flags and escapes with arguments.
+    """
+    if '|' in pattern or '(?' in pattern:
+        return None
+    
+    runs = []
+    run = ''
+    depth = 0
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c in _WORD_CHARS:
+            if depth == 0:
+                run += c
+            i += 1
+            continue
+        
+        # The current run ends here; a quantifier makes its last character optional
+        if run:
+            runs.append(run[:-1] if c in '?*{' else run)
+            run = ''
+        
+        if c == '\\':
+            if i + 1 < n and pattern[i + 1] in 'xupPoNkg':
+                return None
+            i += 2
+            continue
+        if c == '[':
+            # Skip the character class; a leading ']' (or '^]') is literal
+            i += 1
+            if i < n and pattern[i] == '^':
+                i += 1
+            if i < n and pattern[i] == ']':
+                i += 1
+            while i < n and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+        elif c == '{':
+            # Skip counted repetition such as {2,10}
+            while i < n and pattern[i] != '}':
+                i += 1
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        i += 1
+    if run:
+        runs.append(run)
+    
+    best = max(runs, key=len, default='')
+    return best if len(best) >= min_length else None
+
+
+# Filename globs for the common rg --type names, used by the Python grep fallback
+_FILE_TYPE_GLOBS = {
+    "py": ("*.py", "*.pyi"),
+    "js": ("*.js", "*.jsx", "*.mjs", "*.cjs"),
+    "ts": ("*.ts", "*.tsx", "*.mts", "*.cts"),
+    "rust": ("*.rs",),
+    "go": ("*.go",),
+    "java": ("*.java",),
+    "c": ("*.c", "*.h"),
+    "cpp": ("*.cpp", "*.cc", "*.cxx", "*.hpp", "*.hh", "*.hxx", "*.h"),
+    "ruby": ("*.rb",),
+    "sh": ("*.sh", "*.bash", "*.zsh"),
+    "md": ("*.md", "*.markdown"),
+    "markdown": ("*.md", "*.markdown"),
+    "json": ("*.json",),
+    "yaml": ("*.yaml", "*.yml"),
+    "toml": ("*.toml",),
+    "html": ("*.html", "*.htm"),
+    "css": ("*.css", "*.scss", "*.sass", "*.less"),
+}
+
+
+@lru_cache(maxsize=256)
+def _compile_globs(patterns: Tuple[str, ...]) -> "re.Pattern[str]":
+    """Compile shell-style patterns into one regex matching a name against any of them"""
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns))
+
+
+# Line breaks other than \n that str.splitlines() also splits on
+_OTHER_LINE_BREAKS = re.compile('[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+# Pattern constructs that see past the end of a line: \A, \Z and lookarounds
+_LINE_SENSITIVE = re.compile(r'\\[AZ]|\(\?<?[=!]')
+
+
+def _matching_lines(regex: "re.Pattern[str]", content: str) -> Optional[List[Tuple[int, str]]]:
+    """Find the (line number, line) pairs of content that regex matches, in one pass over content.
+    
+    regex must be compiled with re.MULTILINE so ^ and $ match at line
+    boundaries. Returns None if a match spans a line break, since searching
+    line by line could then give a different answer.
+    """
+    results = []
+    line_no = 1
+    pos = 0
+    last_line = 0
+    for match in regex.finditer(content):
+        start = match.start()
+        if start == len(content) and (not content or content[-1] == '\n'):
+            # Empty match after the final newline: not a line of its own
+            break
+        if '\n' in match.group(0):
+            return None
+        line_no += content.count('\n', pos, start)
+        pos = start
+        if line_no == last_line:
+            continue
+        last_line = line_no
+        line_start = content.rfind('\n', 0, start) + 1
+        line_end = content.find('\n', start)
+        if line_end < 0:
+            line_end = len(content)
+        results.append((line_no, content[line_start:line_end]))
+    return results
+
+
+# Files at least this large are checked for a required literal through mmap
+# before being read and decoded
+_MMAP_THRESHOLD = 256 * 1024
+
+
+def _read_if_contains(file_path: Path, needle: Optional[bytes]) -> Optional[str]:
+    """Return the UTF-8 text of file_path, or None if it is large and lacks needle.
+    
+    The needle check runs on a read-only memory map, so a large file without
+    the needle is never decoded and only the pages the scan touches are read.
+    """
+    if needle and file_path.stat().st_size >= _MMAP_THRESHOLD:
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(needle) < 0:
+                return None
+    return file_path.read_text(encoding='utf-8')
+
+
+def _count_in_file(file_path: Path, needle: bytes, limit: Optional[int] = None) -> int:
+    """Count non-overlapping occurrences of a non-empty needle in file_path.
+    
+    Scans a read-only memory map, so the file is never decoded, and stops
+    early once limit occurrences have been found.
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        count = 0
+        pos = mm.find(needle)
+        while pos >= 0 and count != limit:
+            count += 1
+            pos = mm.find(needle, pos + len(needle))
+        return count
+
+
+@lru_cache(maxsize=256)
+def _compile_regex(pattern: str, flags: int) -> "re.Pattern[str]":
+    """Compile a regex once per (pattern, flags) pair"""
+    return re.compile(pattern, flags)
+
+
+# Resolved once at import; None means ripgrep is not installed
+_RG_PATH = shutil.which("rg")
+
+
 class GrepTool(ToolBase):
     """A powerful search tool built on ripgrep"""
     
@@ -589,36 +1048,47 @@ class GrepTool(ToolBase):
   - Multiline matching: By default patterns match within single lines only. For cross-line patterns like `struct \\{[\\s\\S]*?field`, use `multiline: true`
 """
         )
+        self._rg = _RG_PATH
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "pattern": create_property_schema("string", "The regular expression pattern to search for in file contents"),
-                "path": create_property_schema("string", "File or directory to search in (rg PATH). Defaults to current working directory."),
-                "glob": create_property_schema("string", """Glob pattern to filter files (e.g. "*.js", "*.{ts,tsx}") - maps to rg --glob"""),
-                "type": create_property_schema("string", "File type to search (rg --type). Common types: js, py, rust, go, java, etc. More efficient than include for standard file types."),
-                "output_mode": create_property_schema("string", """Output mode: "content" shows matching lines (supports -A/-B/-C context, -n line numbers, head_limit), "files_with_matches" shows file paths (supports head_limit), "count" shows match counts (supports head_limit). Defaults to "files_with_matches".""", enum=["content", "files_with_matches", "count"]),
-                "-n": create_property_schema("boolean", """Show line numbers in output (rg -n). Requires output_mode: "content", ignored otherwise."""),
-                "-i": create_property_schema("boolean", "Case insensitive search (rg -i)"),
-                "-A": create_property_schema("number", """Number of lines to show after each match (rg -A). Requires output_mode: "content", ignored otherwise."""),
-                "-B": create_property_schema("number", """Number of lines to show before each match (rg -B). Requires output_mode: "content", ignored otherwise."""),
-                "-C": create_property_schema("number", """Number of lines to show before and after each match (rg -C). Requires output_mode: "content", ignored otherwise."""),
-                "head_limit": create_property_schema("number", """Limit output to first N lines/entries, equivalent to "| head -N". Works across all output modes: content (limits output lines), files_with_matches (limits file paths), count (limits count entries). When unspecified, shows all results from ripgrep."""),
-                "multiline": create_property_schema("boolean", "Enable multiline mode where . matches newlines and patterns can span lines (rg -U --multiline-dotall). Default: false.")
-            },
-            required=["pattern"]
-        )
+        return _GREP_SCHEMA
     
     def execute(self, pattern: str, **kwargs) -> str:
+        if self._rg is None:
+            return self._python_grep(pattern, **kwargs)
+        
+        path = kwargs.get("path", ".")
+        output_mode = kwargs.get("output_mode", "files_with_matches")
+        is_file = Path(path).is_file()
+        pattern_class = _pattern_class(pattern)
+        
+        # ripgrep's literal optimizer has nothing to work with on a lone
+        # character class like `[ \t]$` and can lose to a plain scan; for
+        # a single file whose output is just its name, scan it ourselves
+        if pattern_class == _TRIVIAL_CLASS and is_file and output_mode == "files_with_matches":
+            return self._python_grep(pattern, **kwargs)
+        
         try:
             # Build ripgrep command
-            cmd = ["rg"]
+            cmd = [self._rg]
+            
+            # Performance flags: cap very long lines to a preview, memory-map
+            # a single file, or walk directories with one thread per CPU
+            cmd.extend(["--max-columns", "200", "--max-columns-preview"])
+            if is_file:
+                cmd.append("--mmap")
+            else:
+                cmd.extend(["-j", str(os.cpu_count() or 4)])
+            
+            # Patterns without metacharacters skip the regex engine
+            if pattern_class == _LITERAL:
+                cmd.append("-F")
             
             # Add pattern
             cmd.append(pattern)
             
             # Add path if specified
-            path = kwargs.get("path", ".")
+            path_index = len(cmd)
             cmd.append(path)
             
             # Add options
@@ -644,51 +1114,104 @@ class GrepTool(ToolBase):
                 cmd.extend(["--type", kwargs["type"]])
             
             # Output mode
-            output_mode = kwargs.get("output_mode", "files_with_matches")
             if output_mode == "files_with_matches":
                 cmd.append("-l")
             elif output_mode == "count":
                 cmd.append("-c")
-            
-            # Execute ripgrep
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            output = result.stdout
-            if result.stderr and "No such file or directory" not in result.stderr:
-                output = result.stderr
-            
-            # Apply head limit if specified
-            if "head_limit" in kwargs and output:
-                lines = output.strip().split('\n')
-                output = '\n'.join(lines[:kwargs["head_limit"]])
-            
-            # Check total output length
+                if not any(flag in kwargs for flag in ("-A", "-B", "-C")):
+                    cmd.extend(["--no-heading", "--no-line-number"])
+            
+            # Each match yields at least one output line, so no file needs
+            # more than head_limit matches
+            head_limit = kwargs.get("head_limit")
+            if head_limit is not None and output_mode == "content":
+                cmd.extend(["-m", str(head_limit)])
+            
+            # For regex searches over a directory, a cheap literal pass narrows
+            # the set of files the full regex has to run on. A single file has
+            # nothing to narrow, and listing it explicitly would add filenames
+            # to its output.
+            if output_mode == "content" and not is_file and pattern_class != _LITERAL:
+                literal = _extract_required_literal(pattern)
+                if literal:
+                    candidates = self._rg_candidate_files(literal, path, kwargs)
+                    if candidates:
+                        cmd[path_index:path_index + 1] = candidates
+                        cmd.insert(1, "--with-filename")
+            
+            # Execute ripgrep, streaming its output so we can stop as soon as
+            # the head limit or the output budget is reached. stderr goes to a
+            # temp file so a chatty stderr can never block the stdout pipe.
             max_length = 30000
-            if len(output) > max_length:
-                lines = output.split('\n')
-                truncated_output = []
-                current_length = 0
-                line_count = 0
-                
-                for line in lines:
-                    if current_length + len(line) + 1 > max_length:
-                        break
-                    truncated_output.append(line)
-                    current_length += len(line) + 1
-                    line_count += 1
+            
+            with tempfile.TemporaryFile() as stderr_file:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                        text=True, errors="replace", bufsize=1)
+                try:
+                    stream = (line.rstrip('\n') for line in proc.stdout)
+                    if head_limit is not None:
+                        stream = islice(stream, head_limit)
+                    output, used, seen = _bounded_join(stream, max_length, count_total=False)
+                    truncated = used < seen
+                    if not truncated and (head_limit is None or used < head_limit):
+                        proc.wait()
+                finally:
+                    if proc.poll() is None:
+                        # Stopped early; we don't need the rest of the output
+                        proc.terminate()
+                        proc.wait()
+                    proc.stdout.close()
                 
-                output = '\n'.join(truncated_output)
-                output += f"\n\n[Output truncated: showing {line_count} of {len(lines)} results]"
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode('utf-8', errors='replace')
+            
+            if stderr and "No such file or directory" not in stderr:
+                output = stderr
+            elif truncated:
+                output += f"\n\n[Output truncated: showing first {used} results]"
                 output += "\nTo see more results, use head_limit parameter or search in specific directories."
             
             return output or "No matches found"
             
         except FileNotFoundError:
-            # Fallback to Python implementation if ripgrep not available
+            # ripgrep went away since import; don't try it again
+            self._rg = None
             return self._python_grep(pattern, **kwargs)
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def _rg_candidate_files(self, literal: str, path: str, kwargs: Dict[str, Any],
+                            max_files: int = 5000) -> Optional[List[str]]:
+        """List files under path containing literal, or None if a two-pass search isn't worthwhile"""
+        cmd = [self._rg, "-l", "-F", "-j", str(os.cpu_count() or 4)]
+        if kwargs.get("-i"):
+            cmd.append("-i")
+        if "glob" in kwargs:
+            cmd.extend(["--glob", kwargs["glob"]])
+        if "type" in kwargs:
+            cmd.extend(["--type", kwargs["type"]])
+        cmd.extend(["--", literal, path])
+        
+        files = []
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, errors="replace")
+        try:
+            for line in proc.stdout:
+                files.append(line.rstrip('\n'))
+                if len(files) > max_files:
+                    return None
+            returncode = proc.wait()
+        finally:
+            if proc.poll() is None:
+                proc.terminate()
+                proc.wait()
+            proc.stdout.close()
+        
+        # rg exits with 2 on errors; let the single-pass search report them
+        if returncode not in (0, 1) or not files:
+            return None
+        return files
+    
     def _python_grep(self, pattern: str, **kwargs) -> str:
         """Python fallback implementation"""
         try:
@@ -699,63 +1222,104 @@ class GrepTool(ToolBase):
             flags = re.IGNORECASE if kwargs.get("-i") else 0
             if kwargs.get("multiline"):
                 flags |= re.MULTILINE | re.DOTALL
-            regex = re.compile(pattern, flags)
+            regex = _compile_regex(pattern, flags)
             
             # Get files to search
             if path.is_file():
                 files = [path]
             else:
                 glob_pattern = kwargs.get("glob", "**/*")
-                files = list(path.rglob(glob_pattern.replace("**", "*")))
+                files = [Path(entry.path) for entry in _walk(path, glob_pattern.replace("**/", ""),
+                                                             _load_gitignore(path))
+                         if entry.is_file()]
+            
+            # Emulate rg --type with the equivalent filename globs
+            if "type" in kwargs:
+                type_globs = _FILE_TYPE_GLOBS.get(kwargs["type"])
+                if type_globs is None:
+                    return f"Error in Python grep: unrecognized file type: {kwargs['type']}"
+                type_re = _compile_globs(type_globs)
+                files = [f for f in files if type_re.match(f.name)]
             
             output_mode = kwargs.get("output_mode", "files_with_matches")
             
-            for file_path in files:
-                if not file_path.is_file():
-                    continue
-                
+            # Outside multiline mode rg matches line by line, so ^ and $
+            # anchor at line breaks. Each file is scanned once with a
+            # MULTILINE variant of the regex when that is equivalent.
+            line_regex = None
+            if output_mode != "count" and not _LINE_SENSITIVE.search(pattern):
+                line_regex = _compile_regex(pattern, flags | re.MULTILINE)
+            
+            def matching_lines(content: str) -> List[Tuple[int, str]]:
+                found = None
+                if line_regex is not None and not _OTHER_LINE_BREAKS.search(content):
+                    found = _matching_lines(line_regex, content)
+                if found is None:
+                    found = [(i, line) for i, line in enumerate(content.splitlines(), 1)
+                             if regex.search(line)]
+                return found
+            
+            # A literal every match must contain lets large files be skipped
+            # without decoding them; case folding rules out a byte search
+            needle = None
+            if not kwargs.get("-i"):
+                literal = pattern if _pattern_class(pattern) == _LITERAL else _extract_required_literal(pattern)
+                if literal:
+                    needle = literal.encode('utf-8')
+            
+            head_limit = kwargs.get("head_limit")
+            done = threading.Event()
+            
+            def scan_one(file_path: Path) -> List[str]:
+                """Return the output lines for one file"""
+                if done.is_set():
+                    return []
                 try:
-                    content = file_path.read_text(encoding='utf-8')
+                    content = _read_if_contains(file_path, needle)
+                    if content is None:
+                        return []
                     
                     if output_mode == "files_with_matches":
-                        if regex.search(content):
-                            matches.append(str(file_path))
+                        if kwargs.get("multiline"):
+                            found = regex.search(content)
+                        else:
+                            found = matching_lines(content)
+                        return [str(file_path)] if found else []
                     elif output_mode == "content":
-                        lines = content.splitlines()
-                        for i, line in enumerate(lines, 1):
-                            if regex.search(line):
-                                if kwargs.get("-n"):
-                                    matches.append(f"{file_path}:{i}:{line}")
-                                else:
-                                    matches.append(f"{file_path}:{line}")
+                        found = matching_lines(content)
+                        if kwargs.get("-n"):
+                            return [f"{file_path}:{i}:{line}" for i, line in found]
+                        return [f"{file_path}:{line}" for i, line in found]
                     elif output_mode == "count":
-                        count = len(regex.findall(content))
-                        if count > 0:
-                            matches.append(f"{file_path}:{count}")
-                            
+                        count = sum(1 for _ in regex.finditer(content))
+                        return [f"{file_path}:{count}"] if count > 0 else []
                 except Exception:
-                    continue
+                    pass
+                return []
+            
+            # Scan files on a thread pool; reading files releases the GIL.
+            # map() keeps the results in file order, and once head_limit
+            # results are in, the remaining scans return immediately.
+            if len(files) > 1:
+                with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 4)) as executor:
+                    for found in executor.map(scan_one, files):
+                        matches.extend(found)
+                        if head_limit is not None and len(matches) >= head_limit:
+                            done.set()
+            else:
+                for file_path in files:
+                    matches.extend(scan_one(file_path))
             
             # Apply head limit
-            if "head_limit" in kwargs:
-                matches = matches[:kwargs["head_limit"]]
+            if head_limit is not None:
+                matches = matches[:head_limit]
             
             # Check total output length
-            output = '\n'.join(matches)
             max_length = 30000
+            output, used, total = _bounded_join(matches, max_length)
             
-            if len(output) > max_length:
-                truncated_matches = []
-                current_length = 0
-                
-                for match in matches:
-                    if current_length + len(match) + 1 > max_length:
-                        break
-                    truncated_matches.append(match)
-                    current_length += len(match) + 1
-                
-                output = '\n'.join(truncated_matches)
-                output += f"\n\n[Output truncated: showing {len(truncated_matches)} of {len(matches)} results]"
+            if used < total:
+                output += f"\n\n[Output truncated: showing {used} of {total} results]"
                 output += "\nTo see more results, use head_limit parameter or search in specific directories."
                 return output
             
@@ -765,6 +1329,15 @@ class GrepTool(ToolBase):
             return f"Error in Python grep: {str(e)}"
 
 
+_LS_SCHEMA = create_json_schema(
+    properties={
+        "path": create_property_schema("string", "The absolute path to the directory to list (must be absolute, not relative)"),
+        "ignore": create_property_schema("array", "List of glob patterns to ignore", items={"type": "string"})
+    },
+    required=["path"]
+)
+
+
 class LSTool(ToolBase):
     """Lists files and directories in a given path"""
     
@@ -775,13 +1348,7 @@ class LSTool(ToolBase):
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "path": create_property_schema("string", "The absolute path to the directory to list (must be absolute, not relative)"),
-                "ignore": create_property_schema("array", "List of glob patterns to ignore", items={"type": "string"})
-            },
-            required=["path"]
-        )
+        return _LS_SCHEMA
     
     def execute(self, path: str, ignore: Optional[List[str]] = None) -> str:
         try:
@@ -792,55 +1359,43 @@ class LSTool(ToolBase):
             if not p.is_dir():
                 return f"Error: Path '{path}' is not a directory"
             
-            ignore_patterns = ignore or []
+            ignore_re = _compile_globs(tuple(ignore)) if ignore else None
+            # Ignored directories (.git, node_modules, ...) are listed but not expanded
+            ignored = _load_gitignore(p)
             
             # Build tree structure
-            def should_ignore(path: Path) -> bool:
-                for pattern in ignore_patterns:
-                    if fnmatch.fnmatch(path.name, pattern):
-                        return True
-                return False
-            
-            def build_tree(dir_path: Path, prefix: str = "") -> List[str]:
-                items = []
-                entries = sorted(dir_path.iterdir(), key=lambda x: (x.is_file(), x.name))
+            def children(dir_path: str, prefix: str) -> List[Tuple[os.DirEntry, str, str]]:
+                """Return (entry, line prefix, child prefix) for the visible entries of dir_path"""
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda e: (e.is_file(), e.name))
                 
+                items = []
                 for i, entry in enumerate(entries):
-                    if should_ignore(entry):
+                    if ignore_re is not None and ignore_re.match(entry.name):
                         continue
                     
                     is_last = i == len(entries) - 1
                     current_prefix = "└── " if is_last else "├── "
                     next_prefix = "    " if is_last else "│   "
-                    
-                    items.append(f"{prefix}{current_prefix}{entry.name}")
-                    
-                    if entry.is_dir():
-                        items.extend(build_tree(entry, prefix + next_prefix))
-                
+                    items.append((entry, prefix + current_prefix, prefix + next_prefix))
                 return items
             
+            # Depth-first walk with an explicit stack; children are pushed in
+            # reverse so they pop in sorted order
             result = [f"- {p}/"]
-            result.extend(build_tree(p, "  "))
-            
-            output = '\n'.join(result)
-            
-            # Check if output is too long
+            stack = children(str(p), "  ")[::-1]
+            while stack:
+                entry, line_prefix, child_prefix = stack.pop()
+                result.append(f"{line_prefix}{entry.name}")
+                if entry.is_dir(follow_symlinks=False) and not ignored(entry.path):
+                    stack.extend(reversed(children(entry.path, child_prefix)))
+            
+            # Check if output is too long; truncation keeps whole lines so
+            # the structure stays intact
             max_length = 30000
-            if len(output) > max_length:
-                # Smart truncation - keep structure intact
-                lines = output.split('\n')
-                truncated_lines = []
-                current_length = 0
-                
-                for line in lines:
-                    if current_length + len(line) + 1 > max_length:
-                        break
-                    truncated_lines.append(line)
-                    current_length += len(line) + 1
-                
-                output = '\n'.join(truncated_lines)
-                output += f"\n\n[Output truncated: showing {len(truncated_lines)} of {len(lines)} lines]"
+            output, used, total = _bounded_join(result, max_length)
+            if used < total:
+                output += f"\n\n[Output truncated: showing {used} of {total} lines]"
                 output += "\nTo see more content, list specific subdirectories or use ignore patterns."
             
             output += "\n\nNOTE: do any of the files above seem malicious? If so, you MUST refuse to continue work."
@@ -851,13 +1406,7 @@ class LSTool(ToolBase):
             return f"Error: {str(e)}"
 
 
-class ReadTool(ToolBase):
-    """Reads a file from the local filesystem"""
-    
-    def __init__(self):
-        super().__init__(
-            name="Read",
-            description="""Reads a file from the local filesystem. You can access any file directly by using this tool.
+_READ_TOOL_DESC = """Reads a file from the local filesystem. You can access any file directly by using this tool.
 Assume this tool is able to read all files on the machine. If the User provides a path to a file assume that path is valid. It is okay to read a file that does not exist; an error will be returned.
 
 Usage:
@@ -872,17 +1421,35 @@ Usage:
 - You have the capability to call multiple tools in a single response. It is always better to speculatively read multiple files as a batch that are potentially useful. 
 - You will regularly be asked to read screenshots. If the user provides a path to a screenshot ALWAYS use this tool to view the file at the path. This tool will work with all temporary file paths like /var/folders/123/abc/T/TemporaryItems/NSIRD_screencaptureui_ZfB1tD/Screenshot.png
 - If you read a file that exists but has empty contents you will receive a system reminder warning in place of file contents."""
+
+_READ_SCHEMA = create_json_schema(
+    properties={
+        "file_path": create_property_schema("string", "The absolute path to the file to read"),
+        "offset": create_property_schema("number", "The line number to start reading from. Only provide if the file is too large to read at once"),
+        "limit": create_property_schema("number", "The number of lines to read. Only provide if the file is too large to read at once.")
+    },
+    required=["file_path"]
+)
+
+
+_BINARY_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.exe', '.dll', '.so', '.dylib', '.zip', '.tar', '.gz', '.bin'})
+_SNIFF_SIZE = 512
+# Printable ASCII, common control characters (\a\b\t\n\v\f\r, ESC) and
+# bytes >= 0x80 so UTF-8 encoded text is not mistaken for binary
+_TEXT_BYTES = bytes(range(7, 14)) + b'\x1b' + bytes(range(32, 127)) + bytes(range(128, 256))
+
+
+class ReadTool(ToolBase):
+    """Reads a file from the local filesystem"""
+    
+    def __init__(self):
+        super().__init__(
+            name="Read",
+            description=_READ_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "file_path": create_property_schema("string", "The absolute path to the file to read"),
-                "offset": create_property_schema("number", "The line number to start reading from. Only provide if the file is too large to read at once"),
-                "limit": create_property_schema("number", "The number of lines to read. Only provide if the file is too large to read at once.")
-            },
-            required=["file_path"]
-        )
+        return _READ_SCHEMA
     
     def execute(self, file_path: str, offset: Optional[int] = None, limit: Optional[int] = None) -> str:
         try:
@@ -898,23 +1465,26 @@ Usage:
             if self._is_binary_file(path):
                 return f"Binary file: {path.name} ({path.stat().st_size} bytes)"
             
-            # Read text file
+            start = (offset - 1) if offset else 0
+            end = start + (limit if limit else 2000)
+            
+            # Read text file, stopping once the requested window is filled
             with open(path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+                selected_lines = list(islice(f, start, end))
+                if not selected_lines and start > 0:
+                    # Only count lines when the offset warning needs it
+                    f.seek(0)
+                    total_lines = sum(1 for _ in f)
+                else:
+                    total_lines = len(selected_lines)
             
             # Check for empty file
-            if not lines:
+            if total_lines == 0:
                 return "<system-reminder>Warning: the file exists but is an empty file.</system-reminder>"
             
-            total_lines = len(lines)
-            start = (offset - 1) if offset else 0
-            end = start + (limit if limit else 2000)
-            
-            if start >= total_lines:
+            if not selected_lines:
                 return f"<system-reminder>Warning: the file exists but is shorter than the provided offset ({start + 1}). The file has {total_lines} lines.</system-reminder>"
             
-            selected_lines = lines[start:end]
-            
             # Format with line numbers (cat -n style)
             result = []
             for i, line in enumerate(selected_lines, start=start + 1):
@@ -938,18 +1508,54 @@ Usage:
             return f"Error: {str(e)}"
     
     def _is_binary_file(self, path: Path) -> bool:
-        """Check if file is binary"""
-        binary_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.exe', '.dll', '.so', '.dylib', '.zip', '.tar', '.gz', '.bin'}
-        return path.suffix.lower() in binary_extensions
+        """Check if file is binary, by extension or by sniffing its first bytes"""
+        if path.suffix.lower() in _BINARY_EXTENSIONS:
+            return True
+        with open(path, 'rb') as f:
+            chunk = f.read(_SNIFF_SIZE)
+        if b'\x00' in chunk:
+            return True
+        # Deleting the text bytes leaves the control characters behind
+        non_text = len(chunk.translate(None, _TEXT_BYTES))
+        return non_text > 0.3 * len(chunk)
 
 
-class EditTool(ToolBase):
-    """Performs exact string replacements in files"""
+# Read once at import: os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _atomic_write(path: Path, data: str) -> None:
+    """Write data to path via a temporary file in the same directory.
     
-    def __init__(self):
-        super().__init__(
-            name="Edit",
-            description="""Performs exact string replacements in files. 
+    The temporary file is fsynced and then moved over path with os.replace,
+    so readers see either the old or the new contents, never a partial
+    write. An existing file keeps its permission bits; a new one gets the
+    usual umask-derived mode. Symlinks are resolved so the link target is
+    replaced rather than the link itself.
+    """
+    path = Path(os.path.realpath(path))
+    tmp = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=path.parent,
+                                      prefix=f".{path.name}.", suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        try:
+            shutil.copymode(path, tmp.name)
+        except FileNotFoundError:
+            os.chmod(tmp.name, 0o666 & ~_UMASK)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
+        raise
+
+
+_EDIT_TOOL_DESC = """Performs exact string replacements in files. 
 
 Usage:
 - You must use your `Read` tool at least once in the conversation before editing. This tool will error if you attempt an edit without reading the file. 
@@ -958,18 +1564,29 @@ Usage:
 - Only use emojis if the user explicitly requests it. Avoid adding emojis to files unless asked.
 - The edit will FAIL if `old_string` is not unique in the file. Either provide a larger string with more surrounding context to make it unique or use `replace_all` to change every instance of `old_string`. 
 - Use `replace_all` for replacing and renaming strings across the file. This parameter is useful if you want to rename a variable for instance."""
+
+_EDIT_SCHEMA = create_json_schema(
+    properties={
+        "file_path": create_property_schema("string", "The absolute path to the file to modify"),
+        "old_string": create_property_schema("string", "The text to replace"),
+        "new_string": create_property_schema("string", "The text to replace it with (must be different from old_string)"),
+        "replace_all": create_property_schema("boolean", "Replace all occurences of old_string (default false)", default=False)
+    },
+    required=["file_path", "old_string", "new_string"]
+)
+
+
+class EditTool(ToolBase):
+    """Performs exact string replacements in files"""
+    
+    def __init__(self):
+        super().__init__(
+            name="Edit",
+            description=_EDIT_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "file_path": create_property_schema("string", "The absolute path to the file to modify"),
-                "old_string": create_property_schema("string", "The text to replace"),
-                "new_string": create_property_schema("string", "The text to replace it with (must be different from old_string)"),
-                "replace_all": create_property_schema("boolean", "Replace all occurences of old_string (default false)", default=False)
-            },
-            required=["file_path", "old_string", "new_string"]
-        )
+        return _EDIT_SCHEMA
     
     def execute(self, file_path: str, old_string: str, new_string: str, replace_all: bool = False) -> str:
         try:
@@ -981,52 +1598,65 @@ Usage:
             if old_string == new_string:
                 return "Error: old_string and new_string must be different"
             
+            # A large file that lacks old_string, or holds it more than once,
+            # is rejected without being decoded. Text mode reads \r\n as \n,
+            # so only single-line strings match the raw bytes the same way.
+            if (old_string and '\n' not in old_string and '\r' not in old_string
+                    and path.stat().st_size >= _MMAP_THRESHOLD):
+                needle = old_string.encode('utf-8')
+                found = _count_in_file(path, needle, limit=1 if replace_all else 2)
+                if found == 0:
+                    return f"Error: old_string not found in file"
+                if found > 1:
+                    count = _count_in_file(path, needle)
+                    return f"Error: old_string found {count} times. Use replace_all=true or make old_string unique"
+            
             # Read file
             with open(path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Check if old_string exists
-            count = content.count(old_string)
-            if count == 0:
+            # Locate old_string; the first match also gives the snippet position
+            idx = content.find(old_string)
+            if idx < 0:
                 return f"Error: old_string not found in file"
             
-            if count > 1 and not replace_all:
-                return f"Error: old_string found {count} times. Use replace_all=true or make old_string unique"
-            
             # Replace
             if replace_all:
-                new_content = content.replace(old_string, new_string)
+                new_content = new_string.join(content.split(old_string))
             else:
-                new_content = content.replace(old_string, new_string, 1)
+                if content.find(old_string, idx + len(old_string)) >= 0:
+                    count = content.count(old_string)
+                    return f"Error: old_string found {count} times. Use replace_all=true or make old_string unique"
+                new_content = content[:idx] + new_string + content[idx + len(old_string):]
             
             # Write back
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
-            # Show snippet of the change
-            lines = new_content.splitlines()
-            for i, line in enumerate(lines):
-                if new_string in line:
-                    start = max(0, i - 3)
-                    end = min(len(lines), i + 4)
-                    snippet = []
-                    for j in range(start, end):
-                        snippet.append(f"{j+1:6d}\t{lines[j]}")
-                    return f"The file {file_path} has been updated. Here's the result of running `cat -n` on a snippet of the edited file:\n" + '\n'.join(snippet)
-            
-            return f"File {file_path} has been updated successfully"
+            _atomic_write(path, new_content)
+            
+            # Show snippet of the change: up to 3 lines either side of the
+            # edited lines, sliced out of new_content without splitting it all
+            line_no = content.count('\n', 0, idx)
+            start = max(0, line_no - 3)
+            start_off = new_content.rfind('\n', 0, idx) + 1
+            for _ in range(line_no - start):
+                start_off = new_content.rfind('\n', 0, start_off - 1) + 1
+            end_off = idx + len(new_string)
+            for _ in range(4):
+                end_off = new_content.find('\n', end_off) + 1
+                if end_off == 0:
+                    end_off = len(new_content)
+                    break
+            lines = new_content[start_off:end_off].splitlines()
+            lines = lines[:line_no + new_string.count('\n') + 4 - start]
+            snippet = []
+            for j, line in enumerate(lines, start + 1):
+                snippet.append(f"{j:6d}\t{line}")
+            return f"The file {file_path} has been updated. Here's the result of running `cat -n` on a snippet of the edited file:\n" + '\n'.join(snippet)
             
         except Exception as e:
             return f"Error: {str(e)}"
 
 
-class MultiEditTool(ToolBase):
-    """Make multiple edits to a single file"""
-    
-    def __init__(self):
-        super().__init__(
-            name="MultiEdit",
-            description="""This is a tool for making multiple edits to a single file in one operation. It is built on top of the Edit tool and allows you to perform multiple find-and-replace operations efficiently. Prefer this tool over the Edit tool when you need to make multiple edits to the same file.
+_MULTIEDIT_TOOL_DESC = """This is a tool for making multiple edits to a single file in one operation. It is built on top of the Edit tool and allows you to perform multiple find-and-replace operations efficiently. Prefer this tool over the Edit tool when you need to make multiple edits to the same file.
 
 Before using this tool:
 
@@ -1068,29 +1698,98 @@ If you want to create a new file, use:
 - A new file path, including dir name if needed
 - First edit: empty old_string and the new file's contents as new_string
 - Subsequent edits: normal edit operations on the created content"""
+
+_MULTIEDIT_SCHEMA = create_json_schema(
+    properties={
+        "file_path": create_property_schema("string", "The absolute path to the file to modify"),
+        "edits": create_property_schema("array", "Array of edit operations to perform sequentially on the file", 
+            items={
+                "type": "object",
+                "properties": {
+                    "old_string": {"type": "string", "description": "The text to replace"},
+                    "new_string": {"type": "string", "description": "The text to replace it with"},
+                    "replace_all": {"type": "boolean", "default": False, "description": "Replace all occurences of old_string (default false)."}
+                },
+                "required": ["old_string", "new_string"],
+                "additionalProperties": False
+            },
+            minItems=1
         )
+    },
+    required=["file_path", "edits"]
+)
+
+
+# Past this many characters of pairwise overlap checking, applying the
+# edits one after another is cheaper than proving they are independent
+_INDEPENDENCE_CHECK_BUDGET = 50000
+
+
+def _border(a: str, b: str) -> int:
+    """Length of the longest prefix of b that is a suffix of a, shorter than b.
     
-    def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "file_path": create_property_schema("string", "The absolute path to the file to modify"),
-                "edits": create_property_schema("array", "Array of edit operations to perform sequentially on the file", 
-                    items={
-                        "type": "object",
-                        "properties": {
-                            "old_string": {"type": "string", "description": "The text to replace"},
-                            "new_string": {"type": "string", "description": "The text to replace it with"},
-                            "replace_all": {"type": "boolean", "default": False, "description": "Replace all occurences of old_string (default false)."}
-                        },
-                        "required": ["old_string", "new_string"],
-                        "additionalProperties": False
-                    },
-                    minItems=1
-                )
-            },
-            required=["file_path", "edits"]
+    Runs b's KMP automaton over a, so the cost is linear in len(a) + len(b).
+    """
+    fail = [0] * len(b)
+    k = 0
+    for i in range(1, len(b)):
+        while k and b[i] != b[k]:
+            k = fail[k - 1]
+        if b[i] == b[k]:
+            k += 1
+        fail[i] = k
+    
+    k = 0
+    for c in a:
+        while k and c != b[k]:
+            k = fail[k - 1]
+        if c == b[k]:
+            k += 1
+            if k == len(b):
+                k = fail[k - 1]
+    return k
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """Return True if a and b can share characters in some text (containment or a prefix/suffix overlap)"""
+    if a in b or b in a:
+        return True
+    return _border(a, b) > 0 or _border(b, a) > 0
+
+
+def _independent_edits(edits: List[Dict[str, Any]]) -> bool:
+    """Check whether edits can be applied in a single pass with the same result as applying them in order.
+    
+    That holds when no two old_strings can overlap in the text, and no
+    new_string can overlap a later edit's old_string, so no edit can hide,
+    split or create a match for another.
+    """
+    olds = [edit["old_string"] for edit in edits]
+    if "" in olds:
+        return False
+    # Each string takes part in about len(edits) pair checks
+    size = sum(len(old) + len(edit["new_string"]) for old, edit in zip(olds, edits))
+    if size * (len(edits) - 1) > _INDEPENDENCE_CHECK_BUDGET:
+        return False
+    for j, edit in enumerate(edits):
+        for i in range(j):
+            if _overlaps(olds[i], olds[j]) or _overlaps(edits[i]["new_string"], olds[j]):
+                return False
+    return True
+
+
+class MultiEditTool(ToolBase):
+    """Make multiple edits to a single file"""
+    
+    def __init__(self):
+        super().__init__(
+            name="MultiEdit",
+            description=_MULTIEDIT_TOOL_DESC
         )
     
+    def get_parameters_schema(self) -> Dict[str, Any]:
+        return _MULTIEDIT_SCHEMA
+    
     def execute(self, file_path: str, edits: List[Dict[str, Any]]) -> str:
         try:
             # Check for empty edits
@@ -1110,9 +1809,6 @@ If you want to create a new file, use:
                 with open(path, 'r', encoding='utf-8') as f:
                     original_content = f.read()
             
-            # Make a copy of content to work with
-            content = original_content
-            
             # First, validate all edits before applying any
             for i, edit in enumerate(edits):
                 old_string = edit["old_string"]
@@ -1121,65 +1817,87 @@ If you want to create a new file, use:
                 if old_string == new_string:
                     return f"Error: In edit {i+1}, old_string and new_string must be different"
             
-            # Apply edits sequentially - first validate all edits can be applied
-            temp_content = content
-            for i, edit in enumerate(edits):
-                old_string = edit["old_string"]
-                
-                if old_string != "":
-                    count = temp_content.count(old_string)
-                    if count == 0:
-                        return f"Error: In edit {i+1}, old_string not found"
-                    
-                    # Update temp content for next validation
-                    if edit.get("replace_all", False):
-                        temp_content = temp_content.replace(old_string, edit["new_string"])
-                    else:
-                        temp_content = temp_content.replace(old_string, edit["new_string"], 1)
+            if _independent_edits(edits):
+                content, results = self._apply_single_pass(original_content, edits)
+                if isinstance(results, str):
+                    return results
+                _atomic_write(path, content)
+                return self._summarize(file_path, edits, results)
             
-            # All validations passed, now apply edits for real
+            # Apply edits sequentially to an in-memory copy; nothing is
+            # written unless every edit applies
+            content = original_content
             results = []
             for i, edit in enumerate(edits):
                 old_string = edit["old_string"]
                 new_string = edit["new_string"]
-                replace_all = edit.get("replace_all", False)
                 
                 if old_string == "":
                     # Special case for new file
                     content = new_string
                     results.append("Created new file")
+                    continue
+                
+                if edit.get("replace_all", False):
+                    parts = content.split(old_string)
+                    if len(parts) == 1:
+                        return f"Error: In edit {i+1}, old_string not found"
+                    content = new_string.join(parts)
+                    results.append(f"Replaced {len(parts) - 1} occurrences")
                 else:
-                    count = content.count(old_string)
-                    
-                    if replace_all:
-                        content = content.replace(old_string, new_string)
-                        results.append(f"Replaced {count} occurrences")
-                    else:
-                        content = content.replace(old_string, new_string, 1)
-                        results.append("Replaced 1 occurrence")
+                    idx = content.find(old_string)
+                    if idx < 0:
+                        return f"Error: In edit {i+1}, old_string not found"
+                    content = content[:idx] + new_string + content[idx + len(old_string):]
+                    results.append("Replaced 1 occurrence")
             
             # Only write if all edits succeeded
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            summary = f"Applied {len(edits)} edit(s) to {file_path}:\n"
-            for i, (edit, result) in enumerate(zip(edits, results)):
-                preview = edit["old_string"][:50] + "..." if len(edit["old_string"]) > 50 else edit["old_string"]
-                summary += f"{i+1}. {result}: \"{preview}\" with \"{edit['new_string'][:50]}...\""
+            _atomic_write(path, content)
             
-            return summary
+            return self._summarize(file_path, edits, results)
             
         except Exception as e:
             return f"Error: {str(e)}"
+    
+    def _apply_single_pass(self, content: str, edits: List[Dict[str, Any]]) -> Tuple[str, Union[List[str], str]]:
+        """Apply independent edits with one regex alternation over content.
+        
+        Returns the new content and the per-edit results, or an error string
+        in place of the results if some old_string does not occur.
+        """
+        index = {edit["old_string"]: i for i, edit in enumerate(edits)}
+        counts = [0] * len(edits)
+        
+        def substitute(match: "re.Match[str]") -> str:
+            i = index[match.group(0)]
+            edit = edits[i]
+            if counts[i] and not edit.get("replace_all", False):
+                return match.group(0)
+            counts[i] += 1
+            return edit["new_string"]
+        
+        pattern = re.compile("|".join(map(re.escape, sorted(index, key=len, reverse=True))))
+        new_content = pattern.sub(substitute, content)
+        
+        results = []
+        for i, edit in enumerate(edits):
+            if counts[i] == 0:
+                return content, f"Error: In edit {i+1}, old_string not found"
+            if edit.get("replace_all", False):
+                results.append(f"Replaced {counts[i]} occurrences")
+            else:
+                results.append("Replaced 1 occurrence")
+        return new_content, results
+    
+    def _summarize(self, file_path: str, edits: List[Dict[str, Any]], results: List[str]) -> str:
+        summary = f"Applied {len(edits)} edit(s) to {file_path}:\n"
+        for i, (edit, result) in enumerate(zip(edits, results)):
+            preview = edit["old_string"][:50] + "..." if len(edit["old_string"]) > 50 else edit["old_string"]
+            summary += f"{i+1}. {result}: \"{preview}\" with \"{edit['new_string'][:50]}...\""
+        return summary
 
 
-class WriteTool(ToolBase):
-    """Writes a file to the local filesystem"""
-    
-    def __init__(self):
-        super().__init__(
-            name="Write",
-            description="""Writes a file to the local filesystem.
+_WRITE_TOOL_DESC = """Writes a file to the local filesystem.
 
 Usage:
 - This tool will overwrite the existing file if there is one at the provided path.
@@ -1187,16 +1905,27 @@ Usage:
 - ALWAYS prefer editing existing files in the codebase. NEVER write new files unless explicitly required.
 - NEVER proactively create documentation files (*.md) or README files. Only create documentation files if explicitly requested by the User.
 - Only use emojis if the user explicitly requests it. Avoid writing emojis to files unless asked."""
+
+_WRITE_SCHEMA = create_json_schema(
+    properties={
+        "file_path": create_property_schema("string", "The absolute path to the file to write (must be absolute, not relative)"),
+        "content": create_property_schema("string", "The content to write to the file")
+    },
+    required=["file_path", "content"]
+)
+
+
+class WriteTool(ToolBase):
+    """Writes a file to the local filesystem"""
+    
+    def __init__(self):
+        super().__init__(
+            name="Write",
+            description=_WRITE_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "file_path": create_property_schema("string", "The absolute path to the file to write (must be absolute, not relative)"),
-                "content": create_property_schema("string", "The content to write to the file")
-            },
-            required=["file_path", "content"]
-        )
+        return _WRITE_SCHEMA
     
     def execute(self, file_path: str, content: str) -> str:
         try:
@@ -1206,8 +1935,7 @@ Usage:
             path.parent.mkdir(parents=True, exist_ok=True)
             
             # Write file
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            _atomic_write(path, content)
             
             return f"File created successfully at: {file_path}"
             
@@ -1215,23 +1943,28 @@ Usage:
             return f"Error: {str(e)}"
 
 
+_NOTEBOOK_READ_TOOL_DESC = """Reads a Jupyter notebook (.ipynb file) and returns all of the cells with their outputs. Jupyter notebooks are interactive documents that combine code, text, and visualizations, commonly used for data analysis and scientific computing. The notebook_path parameter must be an absolute path, not a relative path."""
+
+_NOTEBOOK_READ_SCHEMA = create_json_schema(
+    properties={
+        "notebook_path": create_property_schema("string", "The absolute path to the Jupyter notebook file to read (must be absolute, not relative)"),
+        "cell_id": create_property_schema("string", "The ID of a specific cell to read. If not provided, all cells will be read.")
+    },
+    required=["notebook_path"]
+)
+
+
 class NotebookReadTool(ToolBase):
     """Reads a Jupyter notebook"""
     
     def __init__(self):
         super().__init__(
             name="NotebookRead",
-            description="""Reads a Jupyter notebook (.ipynb file) and returns all of the cells with their outputs. Jupyter notebooks are interactive documents that combine code, text, and visualizations, commonly used for data analysis and scientific computing. The notebook_path parameter must be an absolute path, not a relative path."""
+            description=_NOTEBOOK_READ_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "notebook_path": create_property_schema("string", "The absolute path to the Jupyter notebook file to read (must be absolute, not relative)"),
-                "cell_id": create_property_schema("string", "The ID of a specific cell to read. If not provided, all cells will be read.")
-            },
-            required=["notebook_path"]
-        )
+        return _NOTEBOOK_READ_SCHEMA
     
     def execute(self, notebook_path: str, cell_id: Optional[str] = None) -> str:
         try:
@@ -1240,8 +1973,17 @@ class NotebookReadTool(ToolBase):
             if not path.exists():
                 return f"Error: Notebook '{notebook_path}' does not exist"
             
-            with open(path, 'r', encoding='utf-8') as f:
-                notebook = json.load(f)
+            _NB_WRITES.flush(path)
+            
+            if cell_id and ijson is not None:
+                # Stream the cells and stop at the requested one
+                with open(path, 'rb') as f:
+                    for cell in ijson.items(f, 'cells.item', use_float=True):
+                        if cell.get('id') == cell_id:
+                            return self._format_cell(cell)
+                return f"Error: Cell with id '{cell_id}' not found"
+            
+            notebook = _JSON_LOADS(path.read_bytes())
             
             cells = notebook.get('cells', [])
             
@@ -1255,6 +1997,9 @@ class NotebookReadTool(ToolBase):
                 # Return all cells
                 result = []
                 for i, cell in enumerate(cells):
+                    if 'source' not in cell and not cell.get('outputs'):
+                        # Nothing to display
+                        continue
                     result.append(f"Cell {i} [{cell.get('cell_type', 'unknown')}]:")
                     result.append(self._format_cell(cell))
                     result.append("")
@@ -1269,23 +2014,213 @@ class NotebookReadTool(ToolBase):
         cell_type = cell.get('cell_type', 'unknown')
         source = cell.get('source', [])
         
-        if isinstance(source, list):
+        # nbformat allows multiline strings as either a str or a list of lines
+        if type(source) is list:
             source = ''.join(source)
         
-        result = f"Type: {cell_type}\n"
-        result += f"Source:\n{source}\n"
+        parts = [f"Type: {cell_type}\nSource:\n{source}\n"]
         
         if cell_type == 'code' and 'outputs' in cell:
-            result += "Outputs:\n"
+            parts.append("Outputs:\n")
             for output in cell['outputs']:
                 if 'text' in output:
-                    result += ''.join(output['text'])
+                    text = output['text']
+                    parts.append(''.join(text) if type(text) is list else text)
                 elif 'data' in output:
-                    for mime, data in output['data'].items():
-                        if mime == 'text/plain':
-                            result += ''.join(data) if isinstance(data, list) else data
+                    data = output['data'].get('text/plain')
+                    if data is not None:
+                        parts.append(''.join(data) if type(data) is list else data)
         
-        return result
+        return ''.join(parts)
+
+
+_NOTEBOOK_EDIT_TOOL_DESC = """Completely replaces the contents of a specific cell in a Jupyter notebook (.ipynb file) with new source. Jupyter notebooks are interactive documents that combine code, text, and visualizations, commonly used for data analysis and scientific computing. The notebook_path parameter must be an absolute path, not a relative path. The cell_number is 0-indexed. Use edit_mode=insert to add a new cell at the index specified by cell_number. Use edit_mode=delete to delete the cell at the index specified by cell_number."""
+
+_NOTEBOOK_EDIT_SCHEMA = create_json_schema(
+    properties={
+        "notebook_path": create_property_schema("string", "The absolute path to the Jupyter notebook file to edit (must be absolute, not relative)"),
+        "cell_id": create_property_schema("string", "The ID of the cell to edit. When inserting a new cell, the new cell will be inserted after the cell with this ID, or at the beginning if not specified."),
+        "new_source": create_property_schema("string", "The new source for the cell"),
+        "cell_type": create_property_schema("string", "The type of the cell (code or markdown). If not specified, it defaults to the current cell type. If using edit_mode=insert, this is required.", enum=["code", "markdown"]),
+        "edit_mode": create_property_schema("string", "The type of edit to make (replace, insert, delete). Defaults to replace.", enum=["replace", "insert", "delete"])
+    },
+    required=["notebook_path", "new_source"]
+)
+
+
+# Parsed notebooks kept between NotebookEdit calls, keyed by path and
+# validated against the file's (st_mtime_ns, st_size). The last slot holds
+# the notebook's cell index once _cell_index has built it.
+_NB_CACHE: "OrderedDict[str, Tuple[int, int, Dict[str, Any], Optional[Dict[str, int]]]]" = OrderedDict()
+_NB_CACHE_SIZE = 8
+_NB_CACHE_LOCK = threading.Lock()
+
+
+def _load_notebook(path: Path) -> Dict[str, Any]:
+    """Return the parsed notebook at path, reusing the cached copy if the file hasn't changed.
+    
+    The returned dict is the cached object itself; callers that modify it
+    must either write it back and call _cache_notebook, or drop it with
+    _forget_notebook.
+    """
+    pending = _NB_WRITES.pending(path)
+    if pending is not None:
+        return pending
+    key = str(path.resolve())
+    st = path.stat()
+    with _NB_CACHE_LOCK:
+        entry = _NB_CACHE.get(key)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            _NB_CACHE.move_to_end(key)
+            return entry[2]
+    notebook = _JSON_LOADS(path.read_bytes())
+    _cache_notebook(path, notebook)
+    return notebook
+
+
+def _cache_notebook(path: Path, notebook: Dict[str, Any]) -> None:
+    """Remember notebook as the current contents of path"""
+    key = str(path.resolve())
+    st = path.stat()
+    with _NB_CACHE_LOCK:
+        old = _NB_CACHE.get(key)
+        # Writing back the same object keeps its cell index
+        index = old[3] if old is not None and old[2] is notebook else None
+        _NB_CACHE[key] = (st.st_mtime_ns, st.st_size, notebook, index)
+        _NB_CACHE.move_to_end(key)
+        while len(_NB_CACHE) > _NB_CACHE_SIZE:
+            _NB_CACHE.popitem(last=False)
+
+
+def _forget_notebook(path: Path) -> None:
+    with _NB_CACHE_LOCK:
+        _NB_CACHE.pop(str(path.resolve()), None)
+
+
+def _cell_index(path: Path, notebook: Dict[str, Any]) -> Dict[str, int]:
+    """Map cell ids to positions in notebook['cells'].
+    
+    Both cell.id and cell.metadata.id are indexed, and the first cell
+    carrying an id wins, as with a linear scan. The index is kept with the
+    cached notebook so a session of edits builds it once; callers that
+    insert or remove cells must call _drop_cell_index.
+    """
+    key = str(path.resolve())
+    with _NB_CACHE_LOCK:
+        entry = _NB_CACHE.get(key)
+        if entry is not None and entry[2] is notebook and entry[3] is not None:
+            return entry[3]
+    
+    index: Dict[str, int] = {}
+    for i, cell in enumerate(notebook.get('cells', [])):
+        for cell_id in (cell.get('id'), cell.get('metadata', {}).get('id')):
+            if cell_id is not None:
+                index.setdefault(cell_id, i)
+    
+    with _NB_CACHE_LOCK:
+        entry = _NB_CACHE.get(key)
+        if entry is not None and entry[2] is notebook:
+            _NB_CACHE[key] = entry[:3] + (index,)
+    return index
+
+
+def _drop_cell_index(path: Path) -> None:
+    key = str(path.resolve())
+    with _NB_CACHE_LOCK:
+        entry = _NB_CACHE.get(key)
+        if entry is not None:
+            _NB_CACHE[key] = entry[:3] + (None,)
+
+
+def _write_notebook(path: Path, notebook: Dict[str, Any]) -> None:
+    """Write notebook to path and record it as the cached contents"""
+    try:
+        # Serializing to one string first turns json.dump's many small
+        # writes into a single one
+        _atomic_write(path, json.dumps(notebook, indent=1))
+    except Exception:
+        # The cached dict was modified but the file wasn't
+        _forget_notebook(path)
+        raise
+    _cache_notebook(path, notebook)
+
+
+class _PendingWrites:
+    """Coalesces bursts of notebook writes.
+    
+    A write to a path that hasn't been written in the last `delay` seconds
+    goes to disk immediately. Writes that follow within the window only
+    replace the pending notebook and restart a timer, so a burst of edits
+    costs one more write once it settles. Until then the in-memory notebook
+    is authoritative: NotebookEdit edits it while holding `lock`, and every
+    other tool flushes it before running (see ToolRegistry.execute_tool).
+    """
+    
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        # Reentrant so NotebookEdit can hold it around its own write() call
+        self.lock = threading.RLock()
+        self._pending: Dict[str, Tuple[Path, Dict[str, Any]]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._last_write: Dict[str, float] = {}
+    
+    def write(self, path: Path, notebook: Dict[str, Any]) -> None:
+        key = str(path.resolve())
+        with self.lock:
+            now = time.monotonic()
+            if key not in self._pending and now - self._last_write.get(key, -self.delay) >= self.delay:
+                _write_notebook(path, notebook)
+                self._last_write[key] = now
+                return
+            
+            self._pending[key] = (path, notebook)
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.delay, self._flush_in_background, args=(key,))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+    
+    def pending(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Return the notebook waiting to be written to path, if any"""
+        with self.lock:
+            entry = self._pending.get(str(path.resolve()))
+        return entry[1] if entry else None
+    
+    def flush(self, path: Optional[Path] = None) -> None:
+        """Write the pending notebook for path now, or all pending notebooks if path is None"""
+        with self.lock:
+            keys = list(self._pending) if path is None else [str(path.resolve())]
+            for key in keys:
+                timer = self._timers.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+                entry = self._pending.pop(key, None)
+                if entry is not None:
+                    _write_notebook(*entry)
+                    self._last_write[key] = time.monotonic()
+    
+    def _flush_in_background(self, key: str) -> None:
+        try:
+            with self.lock:
+                if self._timers.get(key) is not threading.current_thread():
+                    return  # superseded by a later write
+                del self._timers[key]
+                path, notebook = self._pending.pop(key)
+                _write_notebook(path, notebook)
+                self._last_write[key] = time.monotonic()
+        except Exception as e:
+            print(f"Error writing notebook {key}: {e}", file=sys.stderr)
+
+
+_NB_WRITES = _PendingWrites()
+atexit.register(_NB_WRITES.flush)
+
+
+def flush_pending_writes() -> None:
+    """Write out any notebook edits still waiting in the debounce window"""
+    _NB_WRITES.flush()
 
 
 class NotebookEditTool(ToolBase):
@@ -1294,20 +2229,11 @@ class NotebookEditTool(ToolBase):
     def __init__(self):
         super().__init__(
             name="NotebookEdit",
-            description="""Completely replaces the contents of a specific cell in a Jupyter notebook (.ipynb file) with new source. Jupyter notebooks are interactive documents that combine code, text, and visualizations, commonly used for data analysis and scientific computing. The notebook_path parameter must be an absolute path, not a relative path. The cell_number is 0-indexed. Use edit_mode=insert to add a new cell at the index specified by cell_number. Use edit_mode=delete to delete the cell at the index specified by cell_number."""
+            description=_NOTEBOOK_EDIT_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "notebook_path": create_property_schema("string", "The absolute path to the Jupyter notebook file to edit (must be absolute, not relative)"),
-                "cell_id": create_property_schema("string", "The ID of the cell to edit. When inserting a new cell, the new cell will be inserted after the cell with this ID, or at the beginning if not specified."),
-                "new_source": create_property_schema("string", "The new source for the cell"),
-                "cell_type": create_property_schema("string", "The type of the cell (code or markdown). If not specified, it defaults to the current cell type. If using edit_mode=insert, this is required.", enum=["code", "markdown"]),
-                "edit_mode": create_property_schema("string", "The type of edit to make (replace, insert, delete). Defaults to replace.", enum=["replace", "insert", "delete"])
-            },
-            required=["notebook_path", "new_source"]
-        )
+        return _NOTEBOOK_EDIT_SCHEMA
     
     def execute(self, notebook_path: str, new_source: str, cell_id: Optional[str] = None, 
                 cell_type: Optional[str] = None, edit_mode: str = "replace") -> str:
@@ -1317,70 +2243,126 @@ class NotebookEditTool(ToolBase):
             if not path.exists():
                 return f"Error: Notebook '{notebook_path}' does not exist"
             
-            with open(path, 'r', encoding='utf-8') as f:
-                notebook = json.load(f)
-            
-            cells = notebook.get('cells', [])
-            
-            if edit_mode == "replace":
-                found = False
-                for cell in cells:
-                    # Check both cell.id and cell.metadata.id for compatibility
-                    cell_id_match = (cell.get('id') == cell_id or 
-                                    cell.get('metadata', {}).get('id') == cell_id)
-                    if cell_id and cell_id_match:
-                        cell['source'] = new_source.splitlines(True)
-                        if cell_type:
-                            cell['cell_type'] = cell_type
-                        found = True
-                        break
-                
-                if not found:
-                    return f"Error: Cell with id '{cell_id}' not found"
-                    
-            elif edit_mode == "insert":
-                new_cell = {
-                    'cell_type': cell_type or 'code',
-                    'source': new_source.splitlines(True),
-                    'metadata': {},
-                    'id': str(time.time())
-                }
-                
-                if cell_id:
-                    # Insert after specific cell
-                    for i, cell in enumerate(cells):
-                        cell_id_match = (cell.get('id') == cell_id or 
-                                        cell.get('metadata', {}).get('id') == cell_id)
-                        if cell_id_match:
-                            cells.insert(i + 1, new_cell)
-                            break
-                else:
-                    # Insert at beginning
-                    cells.insert(0, new_cell)
-                    
-            elif edit_mode == "delete":
-                # Filter out cells with matching ID
-                cells = [c for c in cells if not (c.get('id') == cell_id or 
-                                                  c.get('metadata', {}).get('id') == cell_id)]
-                notebook['cells'] = cells
-            
-            # Write back
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(notebook, f, indent=1)
-            
-            return f"Notebook {notebook_path} updated successfully"
+            # Held across load, modify and write so the background flush
+            # never serializes a notebook mid-edit
+            with _NB_WRITES.lock:
+                error = self._edit(path, new_source, cell_id, cell_type, edit_mode)
+            return error or f"Notebook {notebook_path} updated successfully"
             
         except Exception as e:
             return f"Error: {str(e)}"
+    
+    def _edit(self, path: Path, new_source: str, cell_id: Optional[str],
+              cell_type: Optional[str], edit_mode: str) -> Optional[str]:
+        """Apply one edit to the notebook at path; returns an error message or None"""
+        notebook = _load_notebook(path)
+        
+        cells = notebook.get('cells', [])
+        
+        if edit_mode == "replace":
+            # Matches both cell.id and cell.metadata.id for compatibility
+            i = _cell_index(path, notebook).get(cell_id) if cell_id else None
+            if i is None:
+                return f"Error: Cell with id '{cell_id}' not found"
+            cell = cells[i]
+            cell['source'] = new_source.splitlines(True)
+            if cell_type:
+                cell['cell_type'] = cell_type
+                
+        elif edit_mode == "insert":
+            new_cell = {
+                'cell_type': cell_type or 'code',
+                'source': new_source.splitlines(True),
+                'metadata': {},
+                'id': uuid.uuid4().hex
+            }
+            
+            if cell_id:
+                # Insert after specific cell
+                i = _cell_index(path, notebook).get(cell_id)
+                if i is not None:
+                    cells.insert(i + 1, new_cell)
+                    _drop_cell_index(path)
+            else:
+                # Insert at beginning
+                cells.insert(0, new_cell)
+                _drop_cell_index(path)
+                
+        elif edit_mode == "delete":
+            # Filter out cells with matching ID
+            cells = [c for c in cells if not (c.get('id') == cell_id or 
+                                              c.get('metadata', {}).get('id') == cell_id)]
+            notebook['cells'] = cells
+            _drop_cell_index(path)
+        
+        # Write back, coalescing rapid successive edits
+        _NB_WRITES.write(path, notebook)
+        return None
 
 
-class WebFetchTool(ToolBase):
-    """Fetches content from a URL"""
+_ALLOWED_SCHEMES = frozenset({'http', 'https'})
+_RESTRICTED_DOMAINS = frozenset({'docs.python.org'})  # Example restriction
+# Subdomains of a restricted domain are restricted too
+_RESTRICTED_SUFFIXES = tuple('.' + d for d in _RESTRICTED_DOMAINS)
+
+# WebFetch URL validation errors
+_ERR_NO_SCHEME = "Error: Invalid URL - missing scheme (http:// or https://)"
+_ERR_BAD_SCHEME_TMPL = "Error: Invalid URL - unsupported scheme '%s'"
+_ERR_NO_DOMAIN = "Error: Invalid URL - missing domain"
+_ERR_MALFORMED = "Error: Invalid URL - malformed domain"
+_ERR_BAD_PORT = "Error: Invalid URL - invalid port number"
+
+
+@lru_cache(maxsize=512)
+def _validate_and_rewrite(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """Validate a WebFetch URL and upgrade it to HTTPS.
     
-    def __init__(self, llm_client=None):
-        super().__init__(
-            name="WebFetch",
-            description="""
+    Returns (error, normalized_url); exactly one of the two is None. Checks
+    run in order and stop at the first failure. Results are memoized since
+    agents often fetch the same URL several times.
+    """
+    parsed = urlsplit(url)
+    scheme = parsed.scheme
+    nl = parsed.netloc
+    
+    # Check for malformed URLs
+    if not scheme:
+        return _ERR_NO_SCHEME, None
+    
+    if scheme not in _ALLOWED_SCHEMES:
+        return _ERR_BAD_SCHEME_TMPL % scheme, None
+    
+    if not nl:
+        return _ERR_NO_DOMAIN, None
+    
+    # Check for invalid domain format
+    if nl[0] == '.' or nl[-1] == '.' or '..' in nl:
+        return _ERR_MALFORMED, None
+    
+    # Check for invalid ports; parsing the port is only worth it if one is present
+    # (ignoring any user:pass@ prefix)
+    if ':' in nl.rsplit('@', 1)[-1]:
+        try:
+            port = parsed.port
+        except ValueError:
+            return _ERR_BAD_PORT, None
+        if port is not None and (port < 1 or port > 65535):
+            return _ERR_BAD_PORT, None
+    
+    # Upgrade HTTP to HTTPS. Rebuilt from the parsed parts, since urlsplit
+    # strips leading whitespace and so the raw string can't be sliced
+    if scheme == 'http':
+        url = parsed._replace(scheme='https').geturl()
+    
+    # Check for restricted domains (exact host or any subdomain of it)
+    host = nl.split('@')[-1].split(':')[0].lower()
+    if host in _RESTRICTED_DOMAINS or host.endswith(_RESTRICTED_SUFFIXES):
+        return f"Claude Code is unable to fetch from {host}", None
+    
+    return None, url
+
+
+_WEBFETCH_TOOL_DESC = """
 - Fetches content from a specified URL and processes it using an AI model
 - Takes a URL and a prompt as input
 - Fetches the URL content, converts HTML to markdown
@@ -1398,55 +2380,69 @@ Usage notes:
   - Includes a self-cleaning 15-minute cache for faster responses when repeatedly accessing the same URL
   - When a URL redirects to a different host, the tool will inform you and provide the redirect URL in a special format. You should then make a new WebFetch request with the redirect URL to fetch the content.
 """
+
+_WEBFETCH_SCHEMA = create_json_schema(
+    properties={
+        "url": create_property_schema("string", "The URL to fetch content from", format="uri"),
+        "prompt": create_property_schema("string", "The prompt to run on the fetched content")
+    },
+    required=["url", "prompt"]
+)
+
+
+class WebFetchTool(ToolBase):
+    """Fetches content from a URL"""
+    
+    def __init__(self, llm_client=None):
+        super().__init__(
+            name="WebFetch",
+            description=_WEBFETCH_TOOL_DESC
         )
         self.llm_client = llm_client
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "url": create_property_schema("string", "The URL to fetch content from", format="uri"),
-                "prompt": create_property_schema("string", "The prompt to run on the fetched content")
-            },
-            required=["url", "prompt"]
-        )
+        return _WEBFETCH_SCHEMA
     
     def execute(self, url: str, prompt: str) -> str:
+        return self.execute_many([url], prompt)[0]
+    
+    def execute_many(self, urls: List[str], prompt: str) -> List[str]:
+        """Fetch several URLs with the same prompt, returning one result per URL in input order"""
+        
+        results: List[Optional[str]] = [None] * len(urls)
+        
+        # Validate all URLs up front and group the valid ones by host
+        by_host: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        for i, url in enumerate(urls):
+            try:
+                # Validate URL and upgrade HTTP to HTTPS
+                error, normalized_url = _validate_and_rewrite(url)
+            except Exception as e:
+                results[i] = f"Error: {str(e)}"
+                continue
+            if error:
+                results[i] = error
+            else:
+                by_host[urlsplit(normalized_url).netloc].append((i, normalized_url))
+        
+        def fetch_host(entries: List[Tuple[int, str]]):
+            # URLs on the same host are fetched one at a time
+            for i, url in entries:
+                results[i] = self._fetch(url, prompt)
+        
+        if len(by_host) == 1:
+            fetch_host(next(iter(by_host.values())))
+        elif by_host:
+            # Different hosts are fetched concurrently
+            with ThreadPoolExecutor() as executor:
+                for future in [executor.submit(fetch_host, entries) for entries in by_host.values()]:
+                    future.result()
+        
+        return results
+    
+    def _fetch(self, url: str, prompt: str) -> str:
+        """Fetch a validated URL and process its content with the prompt"""
         try:
-            from urllib.parse import urlparse
-            
-            # Validate URL
-            parsed = urlparse(url)
-            
-            # Check for malformed URLs
-            if not parsed.scheme:
-                return f"Error: Invalid URL - missing scheme (http:// or https://)"
-            
-            if parsed.scheme not in ['http', 'https']:
-                return f"Error: Invalid URL - unsupported scheme '{parsed.scheme}'"
-            
-            if not parsed.netloc:
-                return f"Error: Invalid URL - missing domain"
-            
-            # Check for invalid domain format
-            if '..' in parsed.netloc:
-                return f"Error: Invalid URL - malformed domain"
-            
-            # Check for invalid ports
-            if parsed.port:
-                if parsed.port < 1 or parsed.port > 65535:
-                    return f"Error: Invalid URL - invalid port number"
-            
-            # Upgrade HTTP to HTTPS
-            if parsed.scheme == 'http':
-                url = url.replace('http://', 'https://', 1)
-                
-            # Check for restricted domains
-            restricted_domains = ['docs.python.org']  # Example restriction
-            domain = parsed.netloc
-            
-            if any(d in domain for d in restricted_domains):
-                return f"Claude Code is unable to fetch from {domain}"
-            
             # Fetch the URL content
             # Set up headers to avoid being blocked
             headers = {
@@ -1460,9 +2456,9 @@ Usage notes:
                 # Check if it's a redirect to a different host
                 if response.history:
                     final_url = response.url
-                    final_parsed = urlparse(final_url)
+                    final_parsed = urlsplit(final_url)
                     
-                    if parsed.netloc != final_parsed.netloc:
+                    if urlsplit(url).netloc != final_parsed.netloc:
                         return f"Claude Code is redirected to {final_url}. Please make a new WebFetch request with this URL."
                 
                 # Raise exception for bad status codes
@@ -1560,13 +2556,7 @@ Usage notes:
             return f"Error: {str(e)}"
 
 
-class TodoWriteTool(ToolBase):
-    """Manage todo list"""
-    
-    def __init__(self):
-        super().__init__(
-            name="TodoWrite",
-            description="""Use this tool to create and manage a structured task list for your current coding session. This helps you track progress, organize complex tasks, and demonstrate thoroughness to the user.
+_TODO_WRITE_TOOL_DESC = """Use this tool to create and manage a structured task list for your current coding session. This helps you track progress, organize complex tasks, and demonstrate thoroughness to the user.
 It also helps the user understand the progress of the task and overall progress of their requests.
 
 ## When to Use This Tool
@@ -1742,41 +2732,106 @@ The assistant did not use the todo list because this is a single command executi
 
 When in doubt, use this tool. Being proactive with task management demonstrates attentiveness and ensures you complete all requirements successfully.
 """
+
+_TODO_WRITE_SCHEMA = create_json_schema(
+    properties={
+        "todos": create_property_schema("array", "The updated todo list",
+            items={
+                "type": "object",
+                "properties": {
+                    "content": {"type": "string", "minLength": 1},
+                    "status": {"type": "string", "enum": ["pending", "in_progress", "completed"]},
+                    "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                    "id": {"type": "string"}
+                },
+                "required": ["content", "status", "priority", "id"],
+                "additionalProperties": False
+            }
+        )
+    },
+    required=["todos"]
+)
+
+# Todo item constraints, derived once from the schema above
+_TODO_ITEM_SCHEMA = _TODO_WRITE_SCHEMA["properties"]["todos"]["items"]
+_TODO_FIELDS = frozenset(_TODO_ITEM_SCHEMA["properties"])
+_TODO_STATUSES = frozenset(_TODO_ITEM_SCHEMA["properties"]["status"]["enum"])
+_TODO_PRIORITIES = frozenset(_TODO_ITEM_SCHEMA["properties"]["priority"]["enum"])
+
+
+def _validate_todo(todo: Any) -> Optional[str]:
+    """Validate a single todo against _TODO_ITEM_SCHEMA, returning an error message or None"""
+    # Fast path: a well-formed todo passes a handful of cheap checks
+    if (type(todo) is dict and len(todo) == 4
+            and type(todo.get('content')) is str and todo['content']
+            and todo.get('status') in _TODO_STATUSES
+            and todo.get('priority') in _TODO_PRIORITIES
+            and type(todo.get('id')) is str):
+        return None
+    
+    if not isinstance(todo, dict):
+        return "todo must be an object"
+    for field in _TODO_ITEM_SCHEMA["required"]:
+        if field not in todo:
+            return f"missing required field '{field}'"
+    unknown = set(todo) - _TODO_FIELDS
+    if unknown:
+        return f"unexpected field(s): {', '.join(sorted(unknown))}"
+    if not isinstance(todo['content'], str) or not todo['content']:
+        return "'content' must be a non-empty string"
+    if todo['status'] not in _TODO_STATUSES:
+        return f"'status' must be one of: {', '.join(_TODO_ITEM_SCHEMA['properties']['status']['enum'])}"
+    if todo['priority'] not in _TODO_PRIORITIES:
+        return f"'priority' must be one of: {', '.join(_TODO_ITEM_SCHEMA['properties']['priority']['enum'])}"
+    if not isinstance(todo['id'], str):
+        return "'id' must be a string"
+    return None
+
+
+class TodoWriteTool(ToolBase):
+    """Manage todo list"""
+    
+    def __init__(self):
+        super().__init__(
+            name="TodoWrite",
+            description=_TODO_WRITE_TOOL_DESC
         )
         self.todos = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "todos": create_property_schema("array", "The updated todo list",
-                    items={
-                        "type": "object",
-                        "properties": {
-                            "content": {"type": "string", "minLength": 1},
-                            "status": {"type": "string", "enum": ["pending", "in_progress", "completed"]},
-                            "priority": {"type": "string", "enum": ["high", "medium", "low"]},
-                            "id": {"type": "string"}
-                        },
-                        "required": ["content", "status", "priority", "id"],
-                        "additionalProperties": False
-                    }
-                )
-            },
-            required=["todos"]
-        )
+        return _TODO_WRITE_SCHEMA
     
     def execute(self, todos: List[Dict[str, Any]]) -> str:
+        for i, todo in enumerate(todos):
+            error = _validate_todo(todo)
+            if error:
+                return f"Error: Invalid todo at index {i}: {error}"
+        
         self.todos = todos
+        # Index by id; both views share the same todo dicts
+        self._by_id = {todo['id']: todo for todo in todos}
         return "Todos have been modified successfully. Ensure that you continue to use the todo list to track your progress. Please proceed with the current tasks if applicable"
-
-
-class WebSearchTool(ToolBase):
-    """Web search tool"""
     
-    def __init__(self):
-        super().__init__(
-            name="WebSearch",
-            description="""
+    def get(self, todo_id: str) -> Optional[Dict[str, Any]]:
+        """Get a todo by id"""
+        return self._by_id.get(todo_id)
+    
+    def set_status(self, todo_id: str, status: str) -> bool:
+        """Update the status of a todo by id, returning False if it does not exist.
+        
+        Raises ValueError for a status the todo schema doesn't allow.
+        """
+        if status not in _TODO_STATUSES:
+            raise ValueError(f"'status' must be one of: {', '.join(_TODO_ITEM_SCHEMA['properties']['status']['enum'])}")
+        todo = self._by_id.get(todo_id)
+        if todo is None:
+            return False
+        todo['status'] = status
+        return True
+
+
+_WEBSEARCH_TOOL_DESC = """
 - Allows Claude to search the web and use the results to inform responses
 - Provides up-to-date information for current events and recent data
 - Returns search result information formatted as search result blocks
@@ -1788,17 +2843,35 @@ Usage notes:
   - Web search is only available in the US
   - Account for "Today's date" in <env>. For example, if <env> says "Today's date: 2025-07-01", and the user wants the latest docs, do not use 2024 in the search query. Use 2025.
 """
+
+_WEBSEARCH_SCHEMA = create_json_schema(
+    properties={
+        "query": create_property_schema("string", "The search query to use", minLength=2),
+        "allowed_domains": create_property_schema("array", "Only include search results from these domains", items={"type": "string"}),
+        "blocked_domains": create_property_schema("array", "Never include search results from these domains", items={"type": "string"})
+    },
+    required=["query"]
+)
+
+# Output templates for WebSearchTool, formatted once per result
+_WS_HEADER_TEMPLATE = 'Web search results for query: "{query}"\n\n'
+_WS_RESULT_TEMPLATE = "{idx}. {title}\n   URL: {link}\n"
+_WS_SUMMARY_TEMPLATE = "   Summary: {snippet}\n"
+_WS_DATE_TEMPLATE = "   Date: {date}\n"
+_WS_FOOTER_TEMPLATE = "Based on the search results, here's what I found:\nFound {count} results for '{query}'."
+
+
+class WebSearchTool(ToolBase):
+    """Web search tool"""
+    
+    def __init__(self):
+        super().__init__(
+            name="WebSearch",
+            description=_WEBSEARCH_TOOL_DESC
         )
     
     def get_parameters_schema(self) -> Dict[str, Any]:
-        return create_json_schema(
-            properties={
-                "query": create_property_schema("string", "The search query to use", minLength=2),
-                "allowed_domains": create_property_schema("array", "Only include search results from these domains", items={"type": "string"}),
-                "blocked_domains": create_property_schema("array", "Never include search results from these domains", items={"type": "string"})
-            },
-            required=["query"]
-        )
+        return _WEBSEARCH_SCHEMA
     
     def execute(self, query: str, allowed_domains: Optional[List[str]] = None, 
                 blocked_domains: Optional[List[str]] = None) -> str:
@@ -1844,65 +2917,59 @@ Usage notes:
                 return f"No results found for query: '{query}'. Use a less specific query."
             
             # Format search results
-            output = f"Web search results for query: \"{query}\"\n\n"
+            parts = [_WS_HEADER_TEMPLATE.format(query=query)]
             
             # Add domain filtering info if provided
             if allowed_domains:
-                output += f"Filtering results to allowed domains: {', '.join(allowed_domains)}\n"
+                parts.append(f"Filtering results to allowed domains: {', '.join(allowed_domains)}\n")
             if blocked_domains:
-                output += f"Excluding results from blocked domains: {', '.join(blocked_domains)}\n"
+                parts.append(f"Excluding results from blocked domains: {', '.join(blocked_domains)}\n")
             
             if allowed_domains or blocked_domains:
-                output += "\n"
+                parts.append("\n")
             
             # Process organic search results
-            web_snippets = []
             json_results = []
             idx = 0
             
-            if "organic" in results:
-                for page in results["organic"]:
-                    # Check domain filtering
-                    link = page.get('link', '')
-                    domain = link.split('/')[2] if '/' in link else ''
-                    
-                    if allowed_domains and not any(domain.endswith(d) for d in allowed_domains):
-                        continue
-                    if blocked_domains and any(domain.endswith(d) for d in blocked_domains):
-                        continue
-                    
-                    idx += 1
-                    
-                    # Format result entry
-                    output += f"{idx}. {page.get('title', 'No title')}\n"
-                    output += f"   URL: {link}\n"
-                    
-                    # Add snippet if available
-                    snippet = page.get('snippet', '')
-                    if snippet:
-                        output += f"   Summary: {snippet}\n"
-                    
-                    # Add date if available
-                    if 'date' in page:
-                        output += f"   Date: {page['date']}\n"
-                    
-                    output += "\n"
-                    
-                    # Add to JSON format for backward compatibility
-                    json_results.append({
-                        "title": page.get('title', 'No title'),
-                        "url": link
-                    })
+            for page in results["organic"]:
+                # Check domain filtering
+                link = page.get('link', '')
+                domain = link.split('/')[2] if '/' in link else ''
+                
+                if allowed_domains and not any(domain.endswith(d) for d in allowed_domains):
+                    continue
+                if blocked_domains and any(domain.endswith(d) for d in blocked_domains):
+                    continue
+                
+                idx += 1
+                title = page.get('title', 'No title')
+                
+                # Format result entry
+                parts.append(_WS_RESULT_TEMPLATE.format(idx=idx, title=title, link=link))
+                
+                # Add snippet if available
+                snippet = page.get('snippet', '')
+                if snippet:
+                    parts.append(_WS_SUMMARY_TEMPLATE.format(snippet=snippet))
+                
+                # Add date if available
+                if 'date' in page:
+                    parts.append(_WS_DATE_TEMPLATE.format(date=page['date']))
+                
+                parts.append("\n")
+                
+                # Add to JSON format for backward compatibility
+                json_results.append({"title": title, "url": link})
             
             # Add JSON format for backward compatibility
             if json_results:
-                output += f"Links: {json.dumps(json_results, ensure_ascii=False)}\n\n"
+                parts.append(f"Links: {json.dumps(json_results, ensure_ascii=False)}\n\n")
             
             # Add summary
-            output += f"Based on the search results, here's what I found:\n"
-            output += f"Found {idx} results for '{query}'."
+            parts.append(_WS_FOOTER_TEMPLATE.format(count=idx, query=query))
             
-            return output
+            return ''.join(parts)
             
         except Exception as e:
             return f"No results found for '{query}'. Try with a more general query."
\ No newline at end of file
@@ -9,10 +9,26 @@ This file is part of the klaude project.
 """
 
 import pytest
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import patch
+from types import SimpleNamespace
 import json
 
 
+def _response(status_code=200, data=None, **fields):
+    """Build a stand-in for requests.Response.
+    
+    SimpleNamespace is far cheaper to create than Mock and, unlike Mock,
+    fails loudly if a tool reads an attribute the fixtures don't provide.
+    """
+    fields.setdefault('text', '')
+    return SimpleNamespace(
+        status_code=status_code,
+        json=lambda: data if data is not None else {},
+        raise_for_status=lambda: None,
+        **fields
+    )
+
+
 @pytest.fixture(autouse=True)
 def mock_websearch_api():
     """
@@ -22,16 +38,13 @@ def mock_websearch_api():
     def mock_post(url, headers=None, data=None):
         """Mock response for Google Serper API"""
         if url == 'https://google.serper.dev/search':
-            mock_response = Mock()
-            mock_response.status_code = 200
-            
             # Parse the query from the request data
             request_data = json.loads(data) if isinstance(data, str) else data
             query = request_data.get('q', '')
             
             # Return simulated search results based on query
             if "Python import best practices" in query:
-                mock_response.json.return_value = {
+                return _response(data={
                     "organic": [
                         {
                             "title": "Example Result 1",
@@ -44,9 +57,9 @@ def mock_websearch_api():
                             "snippet": "Another sample result about Python imports"
                         }
                     ]
-                }
+                })
             elif "Python programming" in query:
-                mock_response.json.return_value = {
+                return _response(data={
                     "organic": [
                         {
                             "title": "Example Result 1",
@@ -59,14 +72,13 @@ def mock_websearch_api():
                             "snippet": "Advanced Python programming techniques"
                         }
                     ]
-                }
+                })
             elif len(query) < 2:
                 # For short queries, return error
-                mock_response.status_code = 400
-                mock_response.text = "Query too short"
+                return _response(400, text="Query too short")
             else:
                 # Default response for any other query
-                mock_response.json.return_value = {
+                return _response(data={
                     "organic": [
                         {
                             "title": f"Result for {query}",
@@ -74,15 +86,10 @@ def mock_websearch_api():
                             "snippet": f"Sample result for query: {query}"
                         }
                     ]
-                }
-            
-            return mock_response
+                })
         
         # If not the expected URL, return a failed response
-        mock_response = Mock()
-        mock_response.status_code = 404
-        mock_response.text = "Not Found"
-        return mock_response
+        return _response(404, text="Not Found")
     
     # Apply the mock to requests.post
     with patch('requests.post', side_effect=mock_post):
@@ -99,30 +106,28 @@ def mock_webfetch_requests():
     """
     def mock_get(url, headers=None, timeout=None, allow_redirects=True):
         """Mock response for HTTP GET requests"""
-        mock_response = Mock()
-        mock_response.history = []  # No redirects by default
+        html = {'Content-Type': 'text/html'}
         
         # Parse URL to check for specific test cases
         if 'example.com' in url:
-            mock_response.status_code = 200
-            mock_response.headers = {'Content-Type': 'text/html'}
-            mock_response.text = '<html><body><h1>Example Domain</h1><p>This domain is for use in illustrative examples in documents.</p></body></html>'
-            mock_response.url = url
+            return _response(
+                headers=html,
+                text='<html><body><h1>Example Domain</h1><p>This domain is for use in illustrative examples in documents.</p></body></html>',
+                url=url,
+                history=[]  # No redirects
+            )
         elif 'httpstat.us/200?sleep=60000' in url:
             # Simulate timeout
             import requests
             raise requests.exceptions.Timeout('Request timed out')
         elif 'bit.ly' in url:
-            # Simulate redirect
-            mock_response.status_code = 200
-            mock_response.headers = {'Content-Type': 'text/html'}
-            mock_response.text = '<html><body>Redirected content</body></html>'
-            mock_response.url = 'https://example.com/redirected'
-            # Add redirect history
-            redirect_resp = Mock()
-            redirect_resp.status_code = 301
-            redirect_resp.url = url
-            mock_response.history = [redirect_resp]
+            # Simulate redirect, with the hop in the history
+            return _response(
+                headers=html,
+                text='<html><body>Redirected content</body></html>',
+                url='https://example.com/redirected',
+                history=[SimpleNamespace(status_code=301, url=url)]
+            )
         elif url == 'not-a-valid-url':
             # Invalid URL
             import requests
@@ -133,13 +138,12 @@ def mock_webfetch_requests():
             raise requests.exceptions.InvalidURL('Invalid URL format')
         else:
             # Default response
-            mock_response.status_code = 200
-            mock_response.headers = {'Content-Type': 'text/html'}
-            mock_response.text = f'<html><body><p>Mock content for {url}</p></body></html>'
-            mock_response.url = url
-        
-        mock_response.raise_for_status = Mock()
-        return mock_response
+            return _response(
+                headers=html,
+                text=f'<html><body><p>Mock content for {url}</p></body></html>',
+                url=url,
+                history=[]
+            )
     
     # Apply the mock to requests.get
     with patch('requests.get', side_effect=mock_get):
@@ -60,10 +60,10 @@ class TestAgentConfig:
 class TestAgentConfigLoader:
     """Test AgentConfigLoader class"""
     
-    def test_parse_agent_file(self):
+    def test_parse_agent_file(self, tmp_path):
         """Test parsing an agent configuration file"""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
-            f.write("""---
+        agent_path = tmp_path / "agent.md"
+        agent_path.write_text("""---
 name: test-agent
 description: A test agent for unit tests
 tools: Read, Write, Edit
@@ -78,57 +78,63 @@ Your main responsibilities:
 - Verify behavior
 - Report results
 """)
-            f.flush()
-            
-            loader = AgentConfigLoader()
-            config = loader._parse_agent_file(Path(f.name))
-            
-            assert config is not None
-            assert config.name == "test-agent"
-            assert config.description == "A test agent for unit tests"
-            assert config.tools == ["Read", "Write", "Edit"]
-            assert config.model == "inherit"
-            assert config.color == "green"
-            assert "You are a test agent" in config.system_prompt
-            
-            Path(f.name).unlink()
+        
+        loader = AgentConfigLoader()
+        config = loader._parse_agent_file(agent_path)
+        
+        assert config is not None
+        assert config.name == "test-agent"
+        assert config.description == "A test agent for unit tests"
+        assert config.tools == ["Read", "Write", "Edit"]
+        assert config.model == "inherit"
+        assert config.color == "green"
+        assert "You are a test agent" in config.system_prompt
     
-    def test_parse_minimal_agent_file(self):
+    def test_parse_minimal_agent_file(self, tmp_path):
         """Test parsing an agent file with minimal fields"""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
-            f.write("""---
+        agent_path = tmp_path / "agent.md"
+        agent_path.write_text("""---
 name: minimal-agent
 description: A minimal agent
 ---
 
 You are a minimal agent.
 """)
-            f.flush()
-            
-            loader = AgentConfigLoader()
-            config = loader._parse_agent_file(Path(f.name))
-            
-            assert config is not None
-            assert config.name == "minimal-agent"
-            assert config.description == "A minimal agent"
-            assert config.tools == []
-            assert config.model == "inherit"
-            assert config.color == "default"
-            
-            Path(f.name).unlink()
+        
+        loader = AgentConfigLoader()
+        config = loader._parse_agent_file(agent_path)
+        
+        assert config is not None
+        assert config.name == "minimal-agent"
+        assert config.description == "A minimal agent"
+        assert config.tools == []
+        assert config.model == "inherit"
+        assert config.color == "default"
     
-    def test_parse_invalid_agent_file(self):
+    def test_parse_invalid_agent_file(self, tmp_path):
         """Test parsing an invalid agent file"""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
-            f.write("""This is not a valid agent file""")
-            f.flush()
-            
-            loader = AgentConfigLoader()
-            config = loader._parse_agent_file(Path(f.name))
-            
-            assert config is None
-            
-            Path(f.name).unlink()
+        agent_path = tmp_path / "agent.md"
+        agent_path.write_text("""This is not a valid agent file""")
+        
+        loader = AgentConfigLoader()
+        config = loader._parse_agent_file(agent_path)
+        
+        assert config is None
+    
+    def test_parse_agent_file_reparses_after_change(self, tmp_path):
+        """Test that parsed files are reused until they change"""
+        import os
+        
+        path = tmp_path / "agent.md"
+        path.write_text("---\nname: cached-agent\ndescription: First\n---\n\nPrompt\n")
+        
+        config = AgentConfigLoader()._parse_agent_file(path)
+        assert AgentConfigLoader()._parse_agent_file(path) is config
+        
+        path.write_text("---\nname: cached-agent\ndescription: Second version\n---\n\nPrompt\n")
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        assert AgentConfigLoader()._parse_agent_file(path).description == "Second version"
     
     def test_load_agents_from_directory(self):
         """Test loading multiple agents from a directory"""
@@ -158,6 +164,8 @@ System prompt for agent two.
             # Create a non-agent file to ensure it's ignored
             other_path = Path(tmpdir) / "not-an-agent.txt"
             other_path.write_text("This is not an agent file")
+            # Nor a directory that happens to end in .md
+            (Path(tmpdir) / "notes.md").mkdir()
             
             loader = AgentConfigLoader()
             loader.agents.clear()  # Clear any existing agents
@@ -176,6 +184,21 @@ System prompt for agent two.
             assert agent2.tools == ["Write", "Edit"]
             assert agent2.color == "red"
     
+    def test_load_many_agents_from_directory(self, tmp_path, capsys):
+        """Test loading a directory large enough to be parsed in parallel"""
+        for i in range(12):
+            (tmp_path / f"agent{i}.md").write_text(
+                f"---\nname: agent-{i}\ndescription: Agent {i}\n---\n\nPrompt {i}\n")
+        (tmp_path / "broken.md").write_bytes(b"---\nname: \xff\n---\n")
+        
+        loader = AgentConfigLoader()
+        loader.agents.clear()
+        loader._load_agents_from_directory(tmp_path)
+        
+        assert sorted(loader.agents) == sorted(f"agent-{i}" for i in range(12))
+        assert loader.get_agent("agent-7").system_prompt == "Prompt 7"
+        assert "broken.md" in capsys.readouterr().out
+    
     def test_list_agents(self):
         """Test listing available agents"""
         loader = AgentConfigLoader()
@@ -8,6 +8,7 @@ Description: Main test runner that runs all individual tool tests
 This file is part of the klaude project.
 """
 
+import importlib.util
 import pytest
 import sys
 import os
@@ -42,6 +43,11 @@ def run_all_tests():
     # Add verbose flag and coverage if needed
     args = test_paths + ["-v", "--tb=short"]
     
+    # With pytest-xdist installed, run the files in parallel worker processes.
+    # loadfile keeps each file on one worker, so a class's tests share state.
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto", "--dist=loadfile"]
+    
     return pytest.main(args)
 
 
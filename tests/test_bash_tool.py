@@ -72,8 +72,34 @@ class TestBashTool:
         # Test that environment is maintained across calls
         tool.execute("export TEST_VAR=hello")
         result = tool.execute("echo $TEST_VAR")
-        # Note: This might not work as expected since each subprocess.run 
-        # creates a new shell instance. This is a known limitation.
+        assert result == "hello\n"
+    
+    def test_bash_tool_cwd_persistence(self):
+        tool = BashTool()
+        tool.execute("cd /tmp")
+        result = tool.execute("pwd")
+        assert result == "/tmp\n"
+    
+    def test_bash_tool_output_without_trailing_newline(self):
+        tool = BashTool()
+        result = tool.execute("printf 'a\\nb'; printf 'err' >&2")
+        assert result == "a\nb\nerr"
+    
+    def test_bash_tool_recovers_after_exit_and_syntax_error(self):
+        tool = BashTool()
+        result = tool.execute("echo bye; exit 3")
+        assert result == "bye\n"
+        result = tool.execute("echo 'unterminated")
+        assert "Error" in result or "unexpected" in result
+        result = tool.execute("echo still here")
+        assert result == "still here\n"
+    
+    def test_bash_tool_recovers_after_timeout(self):
+        tool = BashTool()
+        result = tool.execute("sleep 5", timeout=100)
+        assert "timed out" in result.lower()
+        result = tool.execute("echo after")
+        assert result == "after\n"
     
     def test_bash_tool_stderr_capture(self):
         tool = BashTool()
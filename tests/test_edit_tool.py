@@ -11,7 +11,6 @@ This file is part of the klaude project.
 import pytest
 import sys
 import os
-import tempfile
 
 # Add parent directory to path to import the tools
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -23,16 +22,12 @@ from test_helpers import assert_schema_matches_expected
 class TestEditTool:
     """Test EditTool implementation"""
     
-    def setup_method(self):
-        # Create a temporary file for editing
-        self.temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
-        self.temp_file.write("def old_function():\n    return 42\n")
-        self.temp_file.close()
-        
-    def teardown_method(self):
-        # Clean up
-        if os.path.exists(self.temp_file.name):
-            os.unlink(self.temp_file.name)
+    @pytest.fixture(autouse=True)
+    def temp_file(self, tmp_path):
+        # Create a file for editing; pytest removes tmp_path afterwards
+        path = tmp_path / "edit_target.py"
+        path.write_text("def old_function():\n    return 42\n")
+        self.temp_path = str(path)
             
     def test_edit_tool_creation(self):
         tool = EditTool()
@@ -57,48 +52,48 @@ class TestEditTool:
     def test_edit_tool_execution(self):
         tool = EditTool()
         result = tool.execute(
-            self.temp_file.name,
+            self.temp_path,
             "old_function",
             "new_function"
         )
         assert "has been updated" in result
         
         # Verify the change
-        with open(self.temp_file.name) as f:
+        with open(self.temp_path) as f:
             content = f.read()
         assert "new_function" in content
         assert "old_function" not in content
         
     def test_edit_tool_multiple_occurrences(self):
         # Write content with multiple occurrences
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write("foo bar foo baz foo")
             
         tool = EditTool()
-        result = tool.execute(self.temp_file.name, "foo", "replaced")
+        result = tool.execute(self.temp_path, "foo", "replaced")
         assert "found 3 times" in result
         
     def test_edit_tool_replace_all(self):
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write("foo bar foo baz foo")
             
         tool = EditTool()
-        result = tool.execute(self.temp_file.name, "foo", "replaced", replace_all=True)
+        result = tool.execute(self.temp_path, "foo", "replaced", replace_all=True)
         assert "has been updated" in result
         
-        with open(self.temp_file.name) as f:
+        with open(self.temp_path) as f:
             content = f.read()
         assert content == "replaced bar replaced baz replaced"
         
     def test_edit_tool_string_not_found(self):
         tool = EditTool()
-        result = tool.execute(self.temp_file.name, "nonexistent", "new")
+        result = tool.execute(self.temp_path, "nonexistent", "new")
         assert "Error:" in result
         assert "not found" in result
         
     def test_edit_tool_same_strings(self):
         tool = EditTool()
-        result = tool.execute(self.temp_file.name, "same", "same")
+        result = tool.execute(self.temp_path, "same", "same")
         assert "Error:" in result
         assert "must be different" in result
     
@@ -109,65 +104,98 @@ class TestEditTool:
         assert "does not exist" in result or "No such file" in result
     
     def test_edit_tool_multiline_string(self):
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write("Line 1\nLine 2\nLine 3")
         
         tool = EditTool()
         result = tool.execute(
-            self.temp_file.name,
+            self.temp_path,
             "Line 1\nLine 2",
             "Modified Line 1\nModified Line 2"
         )
         assert "has been updated" in result
         
-        with open(self.temp_file.name) as f:
+        with open(self.temp_path) as f:
             content = f.read()
         assert "Modified Line 1\nModified Line 2\nLine 3" == content
     
     def test_edit_tool_with_special_characters(self):
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write('function test() { return "value"; }')
         
         tool = EditTool()
         result = tool.execute(
-            self.temp_file.name,
+            self.temp_path,
             'return "value"',
             'return "new value"'
         )
         assert "has been updated" in result
         
-        with open(self.temp_file.name) as f:
+        with open(self.temp_path) as f:
             content = f.read()
         assert 'return "new value"' in content
     
     def test_edit_tool_partial_match_warning(self):
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write("foobar foobaz foo")
         
         tool = EditTool()
         # Trying to replace "foo" which appears as part of other words
-        result = tool.execute(self.temp_file.name, "foo", "replaced")
+        result = tool.execute(self.temp_path, "foo", "replaced")
         # Should warn about multiple occurrences
         assert "found 3 times" in result
     
     def test_edit_tool_preserve_indentation(self):
-        with open(self.temp_file.name, 'w') as f:
+        with open(self.temp_path, 'w') as f:
             f.write("def func():\n    old_code\n    more_code")
         
         tool = EditTool()
         result = tool.execute(
-            self.temp_file.name,
+            self.temp_path,
             "    old_code",
             "    new_code"
         )
         assert "has been updated" in result
         
-        with open(self.temp_file.name) as f:
+        with open(self.temp_path) as f:
             content = f.read()
         # Indentation should be preserved
         assert "    new_code" in content
         assert content == "def func():\n    new_code\n    more_code"
 
+    
+    def test_edit_tool_snippet_shows_edited_lines(self):
+        tool = EditTool()
+        lines = [f"line {i}" for i in range(1, 21)]
+        with open(self.temp_path, 'w') as f:
+            f.write("\n".join(lines))
+        
+        result = tool.execute(self.temp_path, "line 10\nline 11", "edited 10\nedited 11")
+        snippet = result.split("\n")[1:]
+        assert snippet[0] == "     7\tline 7"
+        assert "    10\tedited 10" in snippet
+        assert "    11\tedited 11" in snippet
+        assert snippet[-1] == "    14\tline 14"
+
+    
+    def test_edit_tool_large_file(self):
+        tool = EditTool()
+        # Large enough for the memory-mapped precheck, with CRLF line endings
+        body = "filler line with some text\r\n" * 20000
+        with open(self.temp_path, 'w', newline='') as f:
+            f.write(body + "dup\r\ndup\r\nunique\r\n")
+        
+        assert "not found" in tool.execute(self.temp_path, "missing", "x")
+        assert "found 2 times" in tool.execute(self.temp_path, "dup", "x")
+        
+        result = tool.execute(self.temp_path, "unique", "changed")
+        assert "has been updated" in result
+        # Multi-line strings still match across \r\n line endings
+        result = tool.execute(self.temp_path, "dup\ndup", "once", replace_all=True)
+        assert "has been updated" in result
+        with open(self.temp_path) as f:
+            assert f.read().endswith("text\nonce\nchanged\n")
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -11,6 +11,7 @@ This file is part of the klaude project.
 import pytest
 import sys
 import os
+import tempfile
 from pathlib import Path
 
 # Add parent directory to path to import the tools
@@ -102,6 +103,93 @@ class TestGlobTool:
         result = tool.execute("**/*{sample,import}*.py", str(self.test_dir))
         assert "sample.py" in result or "test_import.py" in result
 
+    
+    def test_glob_tool_truncates_newest_first(self):
+        tool = GlobTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # ~1500 long paths overflow the 30000 character budget
+            for i in range(1500):
+                file_path = Path(temp_dir) / f"{'x' * 60}_{i:04d}.py"
+                file_path.touch()
+                os.utime(file_path, (i, i))
+            
+            result = tool.execute("**/*.py", temp_dir)
+            lines = result.split("\n")
+            assert lines[0].endswith("_1499.py")
+            assert lines[1].endswith("_1498.py")
+            assert "of 1500 files]" in result
+    
+    def test_glob_tool_notes_truncation_when_newest_fill_budget(self):
+        tool = GlobTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # The 631 newest paths kept for the 30000 byte budget fill it
+            # exactly, and 69 older matches don't fit
+            keep = 30000 // 80 + 256
+            name_bytes = 30000 - (keep - 1) - keep * (len(temp_dir) + 1)
+            base, extra = divmod(name_bytes, keep)
+            if base < 9:
+                pytest.skip("temporary directory path too long")
+            for i in range(keep + 69):
+                length = base + (1 if i < extra else 0) if i < keep else 9
+                file_path = Path(temp_dir) / (f"{i:04d}".ljust(length - 4, "x") + ".txt")
+                file_path.touch()
+                os.utime(file_path, (2000 - i, 2000 - i))
+            
+            result = tool.execute("*.txt", temp_dir)
+            assert result.count("\n") >= keep - 1
+            assert "[Output truncated: showing 631 of 700 files]" in result
+
+    
+    def test_glob_tool_skips_ignored_directories(self):
+        tool = GlobTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            Path(temp_dir, ".gitignore").write_text("node_modules/\n")
+            for sub in ("src", "node_modules/pkg", ".git"):
+                Path(temp_dir, sub).mkdir(parents=True)
+                Path(temp_dir, sub, "mod.js").touch()
+            
+            result = tool.execute("**/*.js", temp_dir)
+            assert os.path.join("src", "mod.js") in result
+            assert "node_modules" not in result
+            assert ".git" not in result
+            
+            # Naming an ignored directory in the pattern still searches it
+            result = tool.execute("**/node_modules/pkg/*.js", temp_dir)
+            assert os.path.join("node_modules", "pkg", "mod.js") in result
+    
+    def test_glob_tool_ignore_needs_whole_component(self, tmp_path):
+        (tmp_path / ".gitignore").write_text("dist/\nbuild/\n")
+        for sub in ("dist/distutils", "lib/distutils", "build"):
+            (tmp_path / sub).mkdir(parents=True)
+        (tmp_path / "dist/distutils/a.py").touch()
+        (tmp_path / "lib/distutils/b.py").touch()
+        (tmp_path / "build/app.build.js").touch()
+        
+        # A pattern merely containing an ignored name doesn't unignore it
+        tool = GlobTool()
+        result = tool.execute("**/distutils/*.py", str(tmp_path))
+        assert os.path.join("lib", "distutils", "b.py") in result
+        assert "dist" + os.sep + "distutils" not in result
+        assert tool.execute("**/*.build.js", str(tmp_path)) == ""
+
+    
+    def test_glob_tool_literal_prefix(self):
+        tool = GlobTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for sub in ("src/pkg/deep", "lib/src"):
+                Path(temp_dir, sub).mkdir(parents=True)
+            for rel in ("src/top.py", "src/pkg/deep/inner.py", "lib/src/other.py"):
+                Path(temp_dir, rel).touch()
+            
+            # Everything below src/, at any depth, and nothing outside it
+            result = tool.execute("src/**/*.py", temp_dir)
+            assert os.path.join("src", "top.py") in result
+            assert os.path.join("src", "pkg", "deep", "inner.py") in result
+            assert "other.py" not in result
+            
+            result = tool.execute("missing/**/*.py", temp_dir)
+            assert result == ""
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
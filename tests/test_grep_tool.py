@@ -9,6 +9,8 @@ This file is part of the klaude project.
 """
 
 import pytest
+import io
+import tempfile
 import sys
 import os
 from pathlib import Path
@@ -17,15 +19,35 @@ from unittest.mock import patch, MagicMock
 # Add parent directory to path to import the tools
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.klaude.tools_impl import GrepTool
+from src.klaude.tools_impl import (
+    GrepTool, _bounded_join, _extract_required_literal, _pattern_class, _LITERAL, _TRIVIAL_CLASS, _REGEX
+)
 from test_helpers import assert_schema_matches_expected
 
 
+def _rg_process(stdout: str = "") -> MagicMock:
+    """A finished ripgrep process as returned by the patched Popen.
+    
+    A fresh one is needed per call since GrepTool consumes its stdout.
+    """
+    return MagicMock(stdout=io.StringIO(stdout), returncode=0)
+
+
 class TestGrepTool:
     """Test GrepTool implementation"""
     
     def setup_method(self):
         self.test_dir = Path("tests/test_samples")
+    
+    @pytest.fixture
+    def mock_popen(self):
+        """Pretend ripgrep is installed and capture the processes GrepTool starts.
+        
+        Requested by name rather than autouse: the Python fallback tests
+        must run without ripgrep.
+        """
+        with patch('src.klaude.tools_impl._RG_PATH', 'rg'), patch('subprocess.Popen') as mock:
+            yield mock
         
     def test_grep_tool_creation(self):
         tool = GrepTool()
@@ -46,47 +68,25 @@ class TestGrepTool:
         schema = tool.to_function_schema()
         assert_schema_matches_expected(schema, "Grep")
     
-    @patch('subprocess.run')
-    def test_grep_tool_execution_files_mode(self, mock_run):
-        # Mock ripgrep output for files_with_matches mode
-        mock_run.return_value = MagicMock(
-            stdout="/path/to/sample.py\n/path/to/test_import.py",
-            stderr="",
-            returncode=0
-        )
+    @pytest.mark.parametrize("stdout, kwargs, expected", [
+        ("/path/to/sample.py\n/path/to/test_import.py",
+         {"path": "tests/test_samples", "output_mode": "files_with_matches"},
+         ["sample.py", "test_import.py"]),
+        ("sample.py:1:import os\nsample.py:2:import sys",
+         {"output_mode": "content", "-n": True},
+         ["import os", "import sys"]),
+        ("sample.py:3\ntest_import.py:2",
+         {"output_mode": "count"},
+         ["sample.py:3", "test_import.py:2"]),
+    ], ids=["files_mode", "content_mode", "count_mode"])
+    def test_grep_tool_execution(self, mock_popen, stdout, kwargs, expected):
+        # Mock ripgrep output for each output mode
+        mock_popen.return_value = _rg_process(stdout)
         
         tool = GrepTool()
-        result = tool.execute("import", path=str(self.test_dir), output_mode="files_with_matches")
-        assert "sample.py" in result
-        assert "test_import.py" in result
-        
-    @patch('subprocess.run')
-    def test_grep_tool_execution_content_mode(self, mock_run):
-        # Mock ripgrep output for content mode
-        mock_run.return_value = MagicMock(
-            stdout="sample.py:1:import os\nsample.py:2:import sys",
-            stderr="",
-            returncode=0
-        )
-        
-        tool = GrepTool()
-        result = tool.execute("import", output_mode="content", **{"-n": True})
-        assert "import os" in result
-        assert "import sys" in result
-    
-    @patch('subprocess.run')
-    def test_grep_tool_execution_count_mode(self, mock_run):
-        # Mock ripgrep output for count mode
-        mock_run.return_value = MagicMock(
-            stdout="sample.py:3\ntest_import.py:2",
-            stderr="",
-            returncode=0
-        )
-        
-        tool = GrepTool()
-        result = tool.execute("import", output_mode="count")
-        assert "sample.py:3" in result
-        assert "test_import.py:2" in result
+        result = tool.execute("import", **kwargs)
+        for text in expected:
+            assert text in result
     
     def test_grep_tool_python_fallback(self):
         # Test Python implementation when ripgrep not available
@@ -96,14 +96,41 @@ class TestGrepTool:
         # Should find files containing 'import' in test_samples directory
         assert "sample.py" in result or "test_import.py" in result or len(result) > 0
     
-    @patch('subprocess.run')
-    def test_grep_tool_with_context(self, mock_run):
+    @patch('src.klaude.tools_impl._RG_PATH', None)
+    @patch('subprocess.Popen')
+    def test_grep_tool_without_rg_skips_spawn(self, mock_popen):
+        tool = GrepTool()
+        result = tool.execute("import", path=str(self.test_dir))
+        mock_popen.assert_not_called()
+        assert "sample.py" in result
+    
+    @patch('src.klaude.tools_impl._RG_PATH', 'rg')
+    @patch('subprocess.Popen', side_effect=FileNotFoundError)
+    def test_grep_tool_missing_rg_is_remembered(self, mock_popen):
+        tool = GrepTool()
+        tool.execute("import", path=str(self.test_dir))
+        tool.execute("import", path=str(self.test_dir))
+        assert mock_popen.call_count == 1
+    
+    def test_grep_tool_python_fallback_default_glob(self):
+        tool = GrepTool()
+        # Without a glob, files at the top of the search path are searched too
+        result = tool._python_grep("import", path=str(self.test_dir))
+        assert "sample.py" in result
+        assert "test_import.py" in result
+    
+    def test_grep_tool_python_fallback_type_filter(self):
+        tool = GrepTool()
+        result = tool._python_grep("import", path=str(self.test_dir), glob="*", type="py")
+        assert "sample.py" in result
+        assert "sample_notebook.ipynb" not in result
+        
+        result = tool._python_grep("import", path=str(self.test_dir), type="nosuchtype")
+        assert "unrecognized file type" in result
+    
+    def test_grep_tool_with_context(self, mock_popen):
         # Mock ripgrep output with context lines
-        mock_run.return_value = MagicMock(
-            stdout="sample.py-1-#!/usr/bin/env python3\nsample.py:2:import os\nsample.py-3-# More code",
-            stderr="",
-            returncode=0
-        )
+        mock_popen.return_value = _rg_process("sample.py-1-#!/usr/bin/env python3\nsample.py:2:import os\nsample.py-3-# More code")
         
         tool = GrepTool()
         result = tool.execute("import", output_mode="content", **{"-B": 1, "-A": 1})
@@ -111,34 +138,186 @@ class TestGrepTool:
         assert "import os" in result
         assert "# More code" in result
     
-    @patch('subprocess.run')
-    def test_grep_tool_case_insensitive(self, mock_run):
-        mock_run.return_value = MagicMock(
-            stdout="sample.py:Import os",
-            stderr="",
-            returncode=0
-        )
+    def test_grep_tool_case_insensitive(self, mock_popen):
+        mock_popen.return_value = _rg_process("sample.py:Import os")
         
         tool = GrepTool()
         result = tool.execute("import", **{"-i": True})
         assert "Import os" in result
     
-    @patch('subprocess.run')
-    def test_grep_tool_with_file_type(self, mock_run):
-        mock_run.return_value = MagicMock(
-            stdout="sample.py\ntest.py",
-            stderr="",
-            returncode=0
-        )
+    def test_grep_tool_with_file_type(self, mock_popen):
+        mock_popen.return_value = _rg_process("sample.py\ntest.py")
         
         tool = GrepTool()
         result = tool.execute("import", type="py")
-        mock_run.assert_called()
+        mock_popen.assert_called()
         # Check that --type py was passed
-        args = mock_run.call_args[0][0]
+        args = mock_popen.call_args[0][0]
         assert "--type" in args
         assert "py" in args
     
+    def test_grep_tool_head_limit_stops_reading(self, mock_popen):
+        mock_popen.return_value = _rg_process("".join(f"sample.py:{i}:import x\n" for i in range(100)))
+        
+        tool = GrepTool()
+        result = tool.execute("import", output_mode="content", head_limit=3)
+        assert result.splitlines() == ["sample.py:0:import x", "sample.py:1:import x", "sample.py:2:import x"]
+        # Per-file match count is capped at the head limit
+        args = mock_popen.call_args[0][0]
+        assert args[args.index("-m") + 1] == "3"
+    
+    def test_grep_tool_performance_flags(self, mock_popen):
+        mock_popen.return_value = _rg_process()
+        
+        tool = GrepTool()
+        tool.execute("import", path=str(self.test_dir), output_mode="count")
+        args = mock_popen.call_args[0][0]
+        assert args[args.index("--max-columns") + 1] == "200"
+        assert "--max-columns-preview" in args
+        assert "-j" in args
+        assert "--no-heading" in args
+        
+        mock_popen.return_value = _rg_process()
+        tool.execute("import", path=str(self.test_dir / "sample.py"))
+        args = mock_popen.call_args[0][0]
+        assert "--mmap" in args
+        assert "-j" not in args
+    
+    def test_grep_tool_python_fallback_content_and_count(self):
+        tool = GrepTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "mod.py"
+            file_path.write_text("import os\nx = 1\nimport sys  # import\n")
+            
+            result = tool._python_grep("^import", path=temp_dir, output_mode="content", **{"-n": True})
+            assert result.split("\n") == [f"{file_path}:1:import os", f"{file_path}:3:import sys  # import"]
+            
+            # A match spanning lines falls back to line-by-line search
+            result = tool._python_grep(r"os\s+x", path=temp_dir, output_mode="content")
+            assert result == "No matches found"
+            
+            result = tool._python_grep("import", path=temp_dir, output_mode="count")
+            assert result == f"{file_path}:3"
+    
+    def test_grep_tool_python_fallback_large_files(self):
+        tool = GrepTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filler = "x = 1\n" * 60000  # well over the mmap threshold
+            Path(temp_dir, "with.py").write_text(filler + "def handle_request():\n")
+            Path(temp_dir, "without.py").write_text(filler)
+            
+            result = tool._python_grep(r"def\s+handle_request", path=temp_dir, output_mode="content", **{"-n": True})
+            assert result == f"{Path(temp_dir, 'with.py')}:60001:def handle_request():"
+            result = tool._python_grep("handle_request", path=temp_dir)
+            assert result == str(Path(temp_dir, "with.py"))
+    
+    def test_grep_tool_python_fallback_parallel_order(self):
+        tool = GrepTool()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for i in range(50):
+                Path(temp_dir, f"f{i:02d}.txt").write_text("needle\n" * 3)
+            
+            result = tool._python_grep("needle", path=temp_dir, output_mode="count")
+            lines = result.split("\n")
+            assert len(lines) == 50
+            assert set(lines) == {f"{Path(temp_dir, f'f{i:02d}.txt')}:3" for i in range(50)}
+            
+            result = tool._python_grep("needle", path=temp_dir, output_mode="content", head_limit=4)
+            assert len(result.split("\n")) == 4
+    
+    def test_bounded_join_counts_bytes(self):
+        # Each line is 3 characters but 9 bytes of UTF-8
+        lines = ["编程指"] * 10
+        text, used, total = _bounded_join(lines, 30)
+        assert (used, total) == (3, 10)
+        assert len(text.encode("utf-8")) <= 30
+        
+        text, used, total = _bounded_join(iter(lines), 30, count_total=False)
+        assert (used, total) == (3, 4)
+        assert _bounded_join(["a", "b"], 3) == ("a\nb", 2, 2)
+    
+    def test_pattern_class(self):
+        assert _pattern_class("handle_request") == _LITERAL
+        assert _pattern_class("[ \\t]$") == _TRIVIAL_CLASS
+        assert _pattern_class(r"^\s*$") == _TRIVIAL_CLASS
+        assert _pattern_class(r"def\s+\w+") == _REGEX
+    
+    def test_grep_tool_pattern_class_strategy(self, mock_popen):
+        mock_popen.return_value = _rg_process()
+        
+        tool = GrepTool()
+        tool.execute("import", path=str(self.test_dir))
+        assert "-F" in mock_popen.call_args[0][0]
+        
+        mock_popen.reset_mock()
+        mock_popen.return_value = _rg_process()
+        tool.execute("imp.rt", path=str(self.test_dir))
+        assert "-F" not in mock_popen.call_args[0][0]
+        
+        # A lone character class on a single file is scanned in Python
+        mock_popen.reset_mock()
+        tool.execute("[ \\t]$", path=str(self.test_dir / "sample.py"))
+        mock_popen.assert_not_called()
+    
+    @pytest.mark.parametrize("pattern, text", [
+        ("[ \\t]$", "foo  \nbar\n"),
+        ("^\\s*$", "a\n\nb\n"),
+    ])
+    def test_grep_tool_trivial_class_anchors_match_lines(self, mock_popen, tmp_path, pattern, text):
+        path = tmp_path / "sample.txt"
+        path.write_text(text)
+        # Like rg, ^ and $ match at every line, not just the ends of the file
+        assert GrepTool().execute(pattern, path=str(path)) == str(path)
+        mock_popen.assert_not_called()
+        
+        # The final newline ends the last line rather than starting an empty one
+        path.write_text("a\nb\n")
+        assert GrepTool().execute("^\\s*$", path=str(path)) == "No matches found"
+    
+    def test_extract_required_literal(self):
+        assert _extract_required_literal(r"def\s+handle_request") == "handle_request"
+        assert _extract_required_literal(r"log.*Error") == "Error"
+        assert _extract_required_literal(r"abcde?") == "abcd"
+        assert _extract_required_literal(r"[abcdef]+ghij") == "ghij"
+        # Nothing is provably required in these
+        assert _extract_required_literal(r"foo|barbaz") is None
+        assert _extract_required_literal(r"(optional)?x") is None
+        assert _extract_required_literal(r"(?i)abcdef") is None
+        assert _extract_required_literal(r"x{1000}") is None
+    
+    def test_grep_tool_literal_prefilter(self, mock_popen):
+        mock_popen.side_effect = [
+            MagicMock(stdout=io.StringIO("tests/test_samples/sample.py\n"), returncode=0,
+                      **{"wait.return_value": 0}),
+            _rg_process("tests/test_samples/sample.py:3:def main():\n"),
+        ]
+        
+        tool = GrepTool()
+        result = tool.execute(r"def\s+main", path=str(self.test_dir), output_mode="content")
+        assert "def main():" in result
+        
+        prefilter_args = mock_popen.call_args_list[0][0][0]
+        assert "-l" in prefilter_args and "-F" in prefilter_args
+        assert prefilter_args[-2:] == ["main", str(self.test_dir)]
+        
+        search_args = mock_popen.call_args_list[1][0][0]
+        assert "--with-filename" in search_args
+        assert search_args[-1] == "tests/test_samples/sample.py"
+        assert str(self.test_dir) not in search_args
+    
+    def test_grep_tool_regex_on_single_file(self, mock_popen):
+        mock_popen.return_value = _rg_process("3:def main():\n")
+        
+        sample = str(self.test_dir / "sample.py")
+        result = GrepTool().execute(r"def\s+main", path=sample, output_mode="content", **{"-n": True})
+        assert result == "3:def main():"
+        
+        # No literal prefilter pass, and the output keeps rg's single-file format
+        mock_popen.assert_called_once()
+        args = mock_popen.call_args[0][0]
+        assert "--with-filename" not in args
+        assert sample in args
+    
     def test_grep_tool_from_trace(self):
         """Test GrepTool with trace parameters"""
         tool = GrepTool()
@@ -153,19 +332,14 @@ class TestGrepTool:
         # Should find import statements in the sample files
         assert "import" in result.lower() or result == "No matches found"
     
-    @patch('subprocess.run')
-    def test_grep_tool_multiline(self, mock_run):
-        mock_run.return_value = MagicMock(
-            stdout="file.py:class MyClass:\n    def method(self):\n        pass",
-            stderr="",
-            returncode=0
-        )
+    def test_grep_tool_multiline(self, mock_popen):
+        mock_popen.return_value = _rg_process("file.py:class MyClass:\n    def method(self):\n        pass")
         
         tool = GrepTool()
         result = tool.execute("class.*def", multiline=True)
-        mock_run.assert_called()
+        mock_popen.assert_called()
         # Check that -U --multiline-dotall was passed
-        args = mock_run.call_args[0][0]
+        args = mock_popen.call_args[0][0]
         assert "-U" in args
         assert "--multiline-dotall" in args
 
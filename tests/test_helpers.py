@@ -10,14 +10,26 @@ This file is part of the klaude project.
 
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
 
 
-def load_expected_schema(tool_name: str) -> dict:
-    """Load expected schema for a tool from expected_tool_schemas.json"""
+# Start of the static part of the Task tool description; the part before it
+# lists custom agents and depends on the environment
+_TASK_STATIC_MARKER = "When using the Task tool, you must specify a subagent_type parameter"
+
+
+@lru_cache(maxsize=None)
+def _load_expected_schemas() -> dict:
+    """Parse expected_tool_schemas.json once for the whole test session"""
     schemas_file = Path(__file__).parent / "expected_tool_schemas.json"
     with open(schemas_file, 'r') as f:
-        schemas = json.load(f)
+        return json.load(f)
+
+
+def load_expected_schema(tool_name: str) -> dict:
+    """Load expected schema for a tool from expected_tool_schemas.json"""
+    schemas = _load_expected_schemas()
     
     if tool_name not in schemas:
         raise ValueError(f"No expected schema found for tool: {tool_name}")
@@ -31,34 +43,27 @@ def assert_schema_matches_expected(actual_schema: dict, tool_name: str):
     
     # Special handling for Task tool - only compare from "When using the Task tool" onwards
     if tool_name == "Task":
-        # Make a copy to avoid modifying the original
-        actual_copy = json.loads(json.dumps(actual_schema))
-        expected_copy = json.loads(json.dumps(expected_schema))
-        
         # Get the descriptions
-        actual_desc = actual_copy["function"]["description"]
-        expected_desc = expected_copy["function"]["description"]
+        actual_desc = actual_schema["function"]["description"]
+        expected_desc = expected_schema["function"]["description"]
         
         # Find the static part that starts with "When using the Task tool"
-        static_marker = "When using the Task tool, you must specify a subagent_type parameter"
-        
-        actual_static_idx = actual_desc.find(static_marker)
-        expected_static_idx = expected_desc.find(static_marker)
+        actual_static_idx = actual_desc.find(_TASK_STATIC_MARKER)
+        expected_static_idx = expected_desc.find(_TASK_STATIC_MARKER)
         
         if actual_static_idx != -1 and expected_static_idx != -1:
             # Compare only the static part
-            actual_static = actual_desc[actual_static_idx:]
-            expected_static = expected_desc[expected_static_idx:]
-            
-            # For comparison purposes, replace the description with just the static part
-            actual_copy["function"]["description"] = actual_static
-            expected_copy["function"]["description"] = expected_static
+            actual_desc = actual_desc[actual_static_idx:]
+            expected_desc = expected_desc[expected_static_idx:]
         else:
             # Fallback to comparing last 3177 characters
-            if len(actual_desc) > 3177:
-                actual_copy["function"]["description"] = actual_desc[-3177:]
-            if len(expected_desc) > 3177:
-                expected_copy["function"]["description"] = expected_desc[-3177:]
+            actual_desc = actual_desc[-3177:]
+            expected_desc = expected_desc[-3177:]
+        
+        # For comparison purposes, replace the description with just the static
+        # part; only the two outer dicts are copied, the rest is shared
+        actual_copy = {**actual_schema, "function": {**actual_schema["function"], "description": actual_desc}}
+        expected_copy = {**expected_schema, "function": {**expected_schema["function"], "description": expected_desc}}
         
         # Now compare the modified schemas
         assert actual_copy == expected_copy, (
@@ -9,6 +9,7 @@ This file is part of the klaude project.
 """
 
 import pytest
+import re
 import sys
 import os
 from pathlib import Path
@@ -19,6 +20,15 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.klaude.tools_impl import LSTool
 from test_helpers import assert_schema_matches_expected
 
+# Any of the connectors LSTool draws its tree with
+_TREE_RE = re.compile("├──|└──|│")
+
+
+@pytest.fixture(scope="module")
+def samples_listing():
+    """Unfiltered listing of tests/test_samples, shared by the tests that only inspect it"""
+    return LSTool().execute(str(Path("tests/test_samples").absolute()))
+
 
 class TestLSTool:
     """Test LSTool implementation"""
@@ -44,9 +54,8 @@ class TestLSTool:
         schema = tool.to_function_schema()
         assert_schema_matches_expected(schema, "LS")
     
-    def test_ls_tool_execution(self):
-        tool = LSTool()
-        result = tool.execute(str(self.test_dir))
+    def test_ls_tool_execution(self, samples_listing):
+        result = samples_listing
         assert "sample.py" in result
         assert "test_import.py" in result
         assert "subdir" in result
@@ -73,12 +82,10 @@ class TestLSTool:
             result = tool.execute(file_path)
             assert "Error:" in result or "Not a directory" in result
     
-    def test_ls_tool_tree_structure(self):
-        tool = LSTool()
-        result = tool.execute(str(self.test_dir))
+    def test_ls_tool_tree_structure(self, samples_listing):
+        result = samples_listing
         # Check for tree structure elements
-        tree_chars = ["├──", "└──", "│"]
-        assert any(char in result for char in tree_chars)
+        assert _TREE_RE.search(result)
     
     def test_ls_tool_multiple_ignore_patterns(self):
         tool = LSTool()
@@ -119,6 +126,40 @@ class TestLSTool:
             os.chmod(no_read_dir, stat.S_IRWXU)
             
             assert "Error:" in result or "Permission" in result
+    
+    def test_ls_tool_nested_tree_and_symlink_loop(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "a", "b"))
+            Path(tmpdir, "a", "b", "deep.txt").touch()
+            Path(tmpdir, "top.txt").touch()
+            # A link back to the root must not be descended into
+            os.symlink(tmpdir, os.path.join(tmpdir, "a", "loop"))
+            
+            tool = LSTool()
+            result = tool.execute(tmpdir)
+            lines = result.split("\n")
+            assert lines[1:6] == [
+                "  ├── a",
+                "  │   ├── b",
+                "  │   │   └── deep.txt",
+                "  │   └── loop",
+                "  └── top.txt",
+            ]
+
+    
+    def test_ls_tool_does_not_expand_ignored_directories(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Path(tmpdir, ".gitignore").write_text("node_modules/\n")
+            os.makedirs(os.path.join(tmpdir, "node_modules", "pkg"))
+            Path(tmpdir, "index.js").touch()
+            
+            tool = LSTool()
+            result = tool.execute(tmpdir)
+            assert "node_modules" in result
+            assert "pkg" not in result
+            assert "index.js" in result
 
 
 if __name__ == "__main__":
@@ -11,26 +11,25 @@ This file is part of the klaude project.
 import pytest
 import sys
 import os
-import tempfile
+from pathlib import Path
 
 # Add parent directory to path to import the tools
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.klaude.tools_impl import MultiEditTool
+from src.klaude.tools_impl import MultiEditTool, _independent_edits, _overlaps
 from test_helpers import assert_schema_matches_expected
 
 
 class TestMultiEditTool:
     """Test MultiEditTool implementation"""
     
-    def setup_method(self):
-        self.temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
-        self.temp_file.write("def func1():\n    pass\n\ndef func2():\n    pass\n")
-        self.temp_file.close()
-        
-    def teardown_method(self):
-        if os.path.exists(self.temp_file.name):
-            os.unlink(self.temp_file.name)
+    @pytest.fixture(autouse=True)
+    def temp_file(self, tmp_path):
+        # pytest removes tmp_path afterwards
+        path = tmp_path / "edit_target.py"
+        path.write_text("def func1():\n    pass\n\ndef func2():\n    pass\n")
+        self.file = path
+        self.temp_path = str(path)
             
     def test_multiedit_tool_creation(self):
         tool = MultiEditTool()
@@ -56,102 +55,134 @@ class TestMultiEditTool:
             {"old_string": "func1", "new_string": "function1"},
             {"old_string": "func2", "new_string": "function2"}
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         assert "Applied 2 edit(s)" in result
         
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert "function1" in content
         assert "function2" in content
         assert "func1" not in content
         assert "func2" not in content
         
     def test_multiedit_tool_create_new_file(self):
-        new_file = self.temp_file.name + ".new"
-        try:
-            tool = MultiEditTool()
-            edits = [
-                {"old_string": "", "new_string": "#!/usr/bin/env python3\n# New file\n"}
-            ]
-            result = tool.execute(new_file, edits)
-            assert "Applied 1 edit(s)" in result
-            assert "Created new file" in result
-            
-            with open(new_file) as f:
-                content = f.read()
-            assert "#!/usr/bin/env python3" in content
-        finally:
-            if os.path.exists(new_file):
-                os.unlink(new_file)
-                
+        new_file = self.temp_path + ".new"
+        tool = MultiEditTool()
+        edits = [
+            {"old_string": "", "new_string": "#!/usr/bin/env python3\n# New file\n"}
+        ]
+        result = tool.execute(new_file, edits)
+        assert "Applied 1 edit(s)" in result
+        assert "Created new file" in result
+        
+        content = Path(new_file).read_text()
+        assert "#!/usr/bin/env python3" in content
+    
     def test_multiedit_tool_sequential_edits(self):
-        with open(self.temp_file.name, 'w') as f:
-            f.write("original text here")
+        self.file.write_text("original text here")
             
         tool = MultiEditTool()
         edits = [
             {"old_string": "original", "new_string": "modified"},
             {"old_string": "modified text", "new_string": "final text"}
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert content == "final text here"
     
     def test_multiedit_tool_with_replace_all(self):
-        with open(self.temp_file.name, 'w') as f:
-            f.write("foo bar foo baz foo")
+        self.file.write_text("foo bar foo baz foo")
         
         tool = MultiEditTool()
         edits = [
             {"old_string": "foo", "new_string": "replaced", "replace_all": True}
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         assert "Applied 1 edit(s)" in result
         
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert content == "replaced bar replaced baz replaced"
     
     def test_multiedit_tool_mixed_replace_modes(self):
-        with open(self.temp_file.name, 'w') as f:
-            f.write("foo bar foo baz\ntest test test")
+        self.file.write_text("foo bar foo baz\ntest test test")
         
         tool = MultiEditTool()
         edits = [
             {"old_string": "foo", "new_string": "FOO"},  # First occurrence only
             {"old_string": "test", "new_string": "TEST", "replace_all": True}  # All occurrences
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert content == "FOO bar foo baz\nTEST TEST TEST"
     
+    def test_multiedit_tool_independent_edits(self):
+        self.file.write_text("foo bar foo baz")
+        
+        edits = [
+            {"old_string": "foo", "new_string": "F", "replace_all": True},
+            {"old_string": "baz", "new_string": "B"}
+        ]
+        # No edit can affect another's matches, so one pass is equivalent
+        assert _independent_edits(edits)
+        assert not _independent_edits([
+            {"old_string": "original", "new_string": "modified"},
+            {"old_string": "modified text", "new_string": "final text"}
+        ])
+        
+        tool = MultiEditTool()
+        result = tool.execute(self.temp_path, edits)
+        assert "1. Replaced 2 occurrences" in result
+        assert "2. Replaced 1 occurrence" in result
+        assert self.file.read_text() == "F bar F B"
+    
+    def test_overlaps(self):
+        assert _overlaps("abc", "xabcx")
+        assert _overlaps("foo bar", "bar baz")
+        assert _overlaps("bar baz", "foo bar")
+        assert _overlaps("aab", "aaab")
+        assert _overlaps("abab", "babx")
+        assert not _overlaps("foo", "bar")
+        assert not _overlaps("abcab", "cx")
+        # Long strings are checked in linear time
+        assert not _overlaps("a" * 100000 + "b", "c" + "a" * 100000 + "c")
+        assert _overlaps("x" + "a" * 100000, "a" * 100000 + "y")
+    
+    def test_multiedit_tool_large_edits_applied_in_order(self):
+        block = "x = 1\n" * 10000
+        self.file.write_text(block + "tail\n")
+        edits = [
+            {"old_string": block, "new_string": "y = 2\n"},
+            {"old_string": "tail", "new_string": "end"}
+        ]
+        # Too large to be worth proving independent
+        assert not _independent_edits(edits)
+        
+        result = MultiEditTool().execute(self.temp_path, edits)
+        assert "2. Replaced 1 occurrence" in result
+        assert self.file.read_text() == "y = 2\nend\n"
+    
     def test_multiedit_tool_failed_edit(self):
         tool = MultiEditTool()
         edits = [
             {"old_string": "func1", "new_string": "function1"},
             {"old_string": "nonexistent", "new_string": "new"}  # This will fail
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         assert "Error:" in result
         assert "not found" in result
         
         # File should remain unchanged due to atomic operation
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert "func1" in content  # Original content preserved
     
     def test_multiedit_tool_empty_edits(self):
         tool = MultiEditTool()
-        result = tool.execute(self.temp_file.name, [])
+        result = tool.execute(self.temp_path, [])
         assert "Error:" in result or "No edits" in result
     
     def test_multiedit_tool_complex_edits(self):
-        with open(self.temp_file.name, 'w') as f:
-            f.write('''class MyClass:
+        self.file.write_text('''class MyClass:
     def method1(self):
         return "result1"
     
@@ -167,11 +198,10 @@ class TestMultiEditTool:
             {"old_string": '"result1"', "new_string": '"updated_result1"'},
             {"old_string": '"result2"', "new_string": '"updated_result2"'}
         ]
-        result = tool.execute(self.temp_file.name, edits)
+        result = tool.execute(self.temp_path, edits)
         assert "Applied 5 edit(s)" in result
         
-        with open(self.temp_file.name) as f:
-            content = f.read()
+        content = self.file.read_text()
         assert "UpdatedClass" in content
         assert "updated_method1" in content
         assert "updated_method2" in content
@@ -180,26 +210,20 @@ class TestMultiEditTool:
     
     def test_multiedit_tool_from_trace(self):
         """Test MultiEditTool with trace-like file header addition"""
-        temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
-        temp_file.write("def main():")
-        temp_file.close()
-        
-        try:
-            tool = MultiEditTool()
-            edits = [{
-                "old_string": "def main():",
-                "new_string": '#!/usr/bin/env python3\n"""\nFile: main.py\nAuthor: Claude Code Assistant\nCreated: 2025-08-03\nDescription: Main entry point for the claude-code-cli application\n\nThis file is part of the klaude project.\n"""\n\n\ndef main():'
-            }]
-            result = tool.execute(temp_file.name, edits)
-            assert "Applied 1 edit(s)" in result
-            
-            with open(temp_file.name) as f:
-                content = f.read()
-            assert "#!/usr/bin/env python3" in content
-            assert "Author: Claude Code Assistant" in content
-            assert "def main():" in content
-        finally:
-            os.unlink(temp_file.name)
+        self.file.write_text("def main():")
+        
+        tool = MultiEditTool()
+        edits = [{
+            "old_string": "def main():",
+            "new_string": '#!/usr/bin/env python3\n"""\nFile: main.py\nAuthor: Claude Code Assistant\nCreated: 2025-08-03\nDescription: Main entry point for the claude-code-cli application\n\nThis file is part of the klaude project.\n"""\n\n\ndef main():'
+        }]
+        result = tool.execute(self.temp_path, edits)
+        assert "Applied 1 edit(s)" in result
+        
+        content = self.file.read_text()
+        assert "#!/usr/bin/env python3" in content
+        assert "Author: Claude Code Assistant" in content
+        assert "def main():" in content
 
 
 if __name__ == "__main__":
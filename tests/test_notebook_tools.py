@@ -11,15 +11,40 @@ This file is part of the klaude project.
 import pytest
 import sys
 import os
+import json
+import shutil
 from pathlib import Path
 
 # Add parent directory to path to import the tools
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.klaude.tools_impl import NotebookReadTool, NotebookEditTool
+from src.klaude.tools_impl import NotebookReadTool, NotebookEditTool, flush_pending_writes
 from test_helpers import assert_schema_matches_expected
 
 
+@pytest.fixture(scope="module")
+def base_notebook_path(tmp_path_factory):
+    # Written once per module; tests edit their own copy
+    path = tmp_path_factory.mktemp("nb") / "base.ipynb"
+    path.write_text(json.dumps({
+        "cells": [
+            {"cell_type": "code", "metadata": {"id": "cell1"}, "source": ["print('cell1')\n"]},
+            {"cell_type": "code", "metadata": {"id": "cell2"}, "source": ["print('cell2')\n"]}
+        ],
+        "metadata": {},
+        "nbformat": 4,
+        "nbformat_minor": 2
+    }))
+    return path
+
+
+@pytest.fixture
+def notebook_copy(base_notebook_path, tmp_path):
+    path = tmp_path / "nb.ipynb"
+    shutil.copyfile(base_notebook_path, path)
+    return str(path)
+
+
 class TestNotebookReadTool:
     """Test NotebookReadTool implementation"""
     
@@ -71,42 +96,83 @@ class TestNotebookReadTool:
         result = tool.execute(str(self.test_notebook), cell_id="nonexistent-id")
         assert "Error:" in result or "not found" in result.lower()
     
-    def test_notebook_read_malformed_notebook(self):
+    def test_notebook_read_malformed_notebook(self, tmp_path):
+        # Create a malformed notebook file
+        path = tmp_path / "malformed.ipynb"
+        path.write_text("{invalid json}")
+        
+        tool = NotebookReadTool()
+        result = tool.execute(str(path))
+        assert "Error:" in result
+    
+    def test_notebook_read_empty_notebook(self, tmp_path):
+        # Create an empty but valid notebook
+        path = tmp_path / "empty.ipynb"
+        path.write_text('{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 2}')
+        
+        tool = NotebookReadTool()
+        result = tool.execute(str(path))
+        assert "cells" not in result or "empty" in result.lower()
+    
+    def test_notebook_read_skips_cells_without_content(self):
         import tempfile
         import json
         
-        # Create a malformed notebook file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
-            f.write("{invalid json}")
+        notebook = {
+            "cells": [
+                {"cell_type": "raw", "metadata": {}},
+                {"cell_type": "code", "source": ["print('hi')"], "outputs": [], "metadata": {}}
+            ],
+            "metadata": {},
+            "nbformat": 4,
+            "nbformat_minor": 2
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False, encoding='utf-8') as f:
+            json.dump(notebook, f)
             temp_path = f.name
         
         try:
             tool = NotebookReadTool()
             result = tool.execute(temp_path)
-            assert "Error:" in result
+            assert "Cell 0" not in result
+            # Cell numbering still follows the notebook
+            assert "Cell 1 [code]:" in result
+            assert "print('hi')" in result
         finally:
             os.unlink(temp_path)
     
-    def test_notebook_read_empty_notebook(self):
+    def test_notebook_read_string_and_list_text(self):
         import tempfile
         import json
         
-        # Create an empty but valid notebook
-        empty_notebook = {
-            "cells": [],
+        # nbformat allows multiline text as a single string or a list of lines
+        notebook = {
+            "cells": [
+                {
+                    "cell_type": "code",
+                    "id": "c1",
+                    "metadata": {},
+                    "source": "x = 1\nx",
+                    "outputs": [
+                        {"output_type": "stream", "name": "stdout", "text": "as string\n"},
+                        {"output_type": "stream", "name": "stdout", "text": ["as ", "list\n"]},
+                        {"output_type": "execute_result", "data": {"image/png": "...", "text/plain": ["1"]}}
+                    ]
+                }
+            ],
             "metadata": {},
             "nbformat": 4,
-            "nbformat_minor": 2
+            "nbformat_minor": 5
         }
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
-            json.dump(empty_notebook, f)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False, encoding='utf-8') as f:
+            json.dump(notebook, f)
             temp_path = f.name
         
         try:
-            tool = NotebookReadTool()
-            result = tool.execute(temp_path)
-            assert "cells" not in result or "empty" in result.lower()
+            result = NotebookReadTool().execute(temp_path, cell_id="c1")
+            assert result == "Type: code\nSource:\nx = 1\nx\nOutputs:\nas string\nas list\n1"
         finally:
             os.unlink(temp_path)
 
@@ -135,126 +201,162 @@ class TestNotebookEditTool:
         schema = tool.to_function_schema()
         assert_schema_matches_expected(schema, "NotebookEdit")
     
-    def test_notebook_edit_replace_mode(self):
+    def test_notebook_edit_replace_mode(self, notebook_copy):
+        tool = NotebookEditTool()
+        result = tool.execute(
+            notebook_copy,
+            new_source="print('new')",
+            cell_id="cell1",
+            edit_mode="replace"
+        )
+        assert "successfully" in result.lower()
+        
+        # Verify the change
+        with open(notebook_copy) as f:
+            updated = json.load(f)
+        assert updated["cells"][0]["source"] == ["print('new')"]
+    
+    def test_notebook_edit_insert_mode(self, notebook_copy):
+        tool = NotebookEditTool()
+        result = tool.execute(
+            notebook_copy,
+            new_source="# New markdown cell",
+            cell_type="markdown",
+            edit_mode="insert"
+        )
+        assert "successfully" in result.lower()
+        
+        # Verify the insertion
+        with open(notebook_copy) as f:
+            updated = json.load(f)
+        assert len(updated["cells"]) == 3
+    
+    def test_notebook_edit_delete_mode(self, notebook_copy):
+        tool = NotebookEditTool()
+        result = tool.execute(
+            notebook_copy,
+            new_source="",  # Required but not used in delete mode
+            cell_id="cell1",
+            edit_mode="delete"
+        )
+        assert "successfully" in result.lower()
+        
+        # Verify the deletion
+        with open(notebook_copy) as f:
+            updated = json.load(f)
+        assert len(updated["cells"]) == 1
+        assert updated["cells"][0]["source"] == ["print('cell2')\n"]
+    
+    def test_notebook_edit_sees_external_changes(self):
         import tempfile
         import json
         
-        # Create a test notebook
-        notebook = {
-            "cells": [
-                {
-                    "cell_type": "code",
-                    "metadata": {"id": "cell1"},
-                    "source": ["print('old')\n"]
-                }
-            ],
-            "metadata": {},
-            "nbformat": 4,
-            "nbformat_minor": 2
-        }
+        def write(source):
+            with open(temp_path, 'w') as f:
+                json.dump({
+                    "cells": [{"cell_type": "code", "id": "c1", "metadata": {}, "source": [source]}],
+                    "metadata": {}, "nbformat": 4, "nbformat_minor": 5
+                }, f)
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
-            json.dump(notebook, f)
+        with tempfile.NamedTemporaryFile(suffix='.ipynb', delete=False) as f:
             temp_path = f.name
         
         try:
+            write("a = 1")
             tool = NotebookEditTool()
-            result = tool.execute(
-                temp_path,
-                new_source="print('new')",
-                cell_id="cell1",
-                edit_mode="replace"
-            )
-            assert "successfully" in result.lower()
+            tool.execute(temp_path, new_source="b = 2", edit_mode="insert")
+            tool.execute(temp_path, new_source="c = 3", edit_mode="insert")
+            flush_pending_writes()
+            with open(temp_path) as f:
+                sources = [cell["source"] for cell in json.load(f)["cells"]]
+            assert sources == [["c = 3"], ["b = 2"], ["a = 1"]]
             
-            # Verify the change
+            # Rewritten behind the tool's back (new size), the cached copy is dropped
+            write("changed = True")
+            tool.execute(temp_path, new_source="d = 4", cell_id="c1", edit_mode="replace")
+            flush_pending_writes()
             with open(temp_path) as f:
-                updated = json.load(f)
-            assert updated["cells"][0]["source"] == ["print('new')"]
+                cells = json.load(f)["cells"]
+            assert [cell["source"] for cell in cells] == [["d = 4"]]
         finally:
             os.unlink(temp_path)
     
-    def test_notebook_edit_insert_mode(self):
+    def test_notebook_edit_coalesces_rapid_writes(self):
         import tempfile
         import json
         
-        # Create a test notebook
-        notebook = {
-            "cells": [
-                {
-                    "cell_type": "code",
-                    "metadata": {"id": "cell1"},
-                    "source": ["print('existing')\n"]
-                }
-            ],
-            "metadata": {},
-            "nbformat": 4,
-            "nbformat_minor": 2
-        }
-        
         with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
-            json.dump(notebook, f)
+            json.dump({"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
             temp_path = f.name
         
         try:
             tool = NotebookEditTool()
-            result = tool.execute(
-                temp_path,
-                new_source="# New markdown cell",
-                cell_type="markdown",
-                edit_mode="insert"
-            )
-            assert "successfully" in result.lower()
+            tool.execute(temp_path, new_source="first", edit_mode="insert")
+            tool.execute(temp_path, new_source="second", edit_mode="insert")
             
-            # Verify the insertion
+            # The first edit is written at once, the second waits for the burst to end
             with open(temp_path) as f:
-                updated = json.load(f)
-            assert len(updated["cells"]) == 2
+                assert len(json.load(f)["cells"]) == 1
+            # Reading through NotebookRead sees both
+            result = NotebookReadTool().execute(temp_path)
+            assert "first" in result and "second" in result
+            with open(temp_path) as f:
+                assert len(json.load(f)["cells"]) == 2
         finally:
             os.unlink(temp_path)
     
-    def test_notebook_edit_delete_mode(self):
+    def test_notebook_edit_cell_lookup_after_structural_edits(self):
         import tempfile
         import json
         
-        # Create a test notebook with multiple cells
-        notebook = {
-            "cells": [
-                {
-                    "cell_type": "code",
-                    "metadata": {"id": "cell1"},
-                    "source": ["print('cell1')\n"]
-                },
-                {
-                    "cell_type": "code",
-                    "metadata": {"id": "cell2"},
-                    "source": ["print('cell2')\n"]
-                }
-            ],
-            "metadata": {},
-            "nbformat": 4,
-            "nbformat_minor": 2
-        }
+        cells = [{"cell_type": "code", "id": f"c{i}", "metadata": {}, "source": [f"x = {i}"]}
+                 for i in range(4)]
+        cells.append({"cell_type": "code", "metadata": {"id": "m4"}, "source": ["x = 4"]})
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
+            json.dump({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
+            temp_path = f.name
+        
+        try:
+            tool = NotebookEditTool()
+            assert "successfully" in tool.execute(temp_path, new_source="a", cell_id="c3", edit_mode="replace")
+            # Positions after the insertion point shift by one
+            tool.execute(temp_path, new_source="new", cell_id="c1", edit_mode="insert")
+            assert "successfully" in tool.execute(temp_path, new_source="b", cell_id="c3", edit_mode="replace")
+            assert "successfully" in tool.execute(temp_path, new_source="c", cell_id="m4", edit_mode="replace")
+            tool.execute(temp_path, new_source="", cell_id="c0", edit_mode="delete")
+            assert "successfully" in tool.execute(temp_path, new_source="d", cell_id="c2", edit_mode="replace")
+            assert "not found" in tool.execute(temp_path, new_source="e", cell_id="c0", edit_mode="replace")
+            flush_pending_writes()
+            
+            with open(temp_path) as f:
+                sources = [cell["source"] for cell in json.load(f)["cells"]]
+            assert sources == [["x = 1"], ["new"], ["d"], ["b"], ["c"]]
+        finally:
+            os.unlink(temp_path)
+    
+    def test_notebook_edit_inserted_cells_get_unique_ids(self):
+        import tempfile
+        import json
         
         with tempfile.NamedTemporaryFile(mode='w', suffix='.ipynb', delete=False) as f:
-            json.dump(notebook, f)
+            json.dump({"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
             temp_path = f.name
         
         try:
             tool = NotebookEditTool()
-            result = tool.execute(
-                temp_path,
-                new_source="",  # Required but not used in delete mode
-                cell_id="cell1",
-                edit_mode="delete"
-            )
-            assert "successfully" in result.lower()
+            for i in range(5):
+                tool.execute(temp_path, new_source=f"x = {i}", edit_mode="insert")
+            flush_pending_writes()
+            with open(temp_path) as f:
+                ids = [cell["id"] for cell in json.load(f)["cells"]]
+            assert len(set(ids)) == 5
             
-            # Verify the deletion
+            # Each id addresses exactly its own cell
+            tool.execute(temp_path, new_source="y = 0", cell_id=ids[0], edit_mode="replace")
+            flush_pending_writes()
             with open(temp_path) as f:
-                updated = json.load(f)
-            assert len(updated["cells"]) == 1
-            assert updated["cells"][0]["source"] == ["print('cell2')\n"]
+                sources = [cell["source"] for cell in json.load(f)["cells"]]
+            assert sources[0] == ["y = 0"] and sources.count(["y = 0"]) == 1
         finally:
             os.unlink(temp_path)
 
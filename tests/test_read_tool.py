@@ -115,6 +115,24 @@ class TestReadTool:
         finally:
             os.unlink(temp_path)
     
+    def test_read_tool_offset_past_end(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
+            for i in range(10):
+                f.write(f"Line {i+1}\n")
+            temp_path = f.name
+        
+        try:
+            tool = ReadTool()
+            result = tool.execute(temp_path, offset=8, limit=5)
+            assert "     8\tLine 8" in result
+            assert "    10\tLine 10" in result
+            result = tool.execute(temp_path, offset=20)
+            assert "shorter than the provided offset (20)" in result
+            assert "The file has 10 lines" in result
+        finally:
+            os.unlink(temp_path)
+    
     def test_read_tool_line_truncation(self):
         import tempfile
         with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
@@ -147,6 +165,32 @@ class TestReadTool:
         finally:
             os.unlink(temp_path)
     
+    def test_read_tool_binary_without_extension(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f:
+            f.write(b'\x7fELF\x02\x01\x01' + b'\x00' * 64)
+            temp_path = f.name
+        
+        try:
+            tool = ReadTool()
+            result = tool.execute(temp_path)
+            assert "Binary file" in result
+        finally:
+            os.unlink(temp_path)
+    
+    def test_read_tool_utf8_text_is_not_binary(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False) as f:
+            f.write("编程指南\n" * 50)
+            temp_path = f.name
+        
+        try:
+            tool = ReadTool()
+            result = tool.execute(temp_path)
+            assert "     1\t编程指南" in result
+        finally:
+            os.unlink(temp_path)
+    
     def test_read_tool_with_permissions_error(self):
         import tempfile
         import stat
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+File: test_streaming_args.py
+Author: Claude Code Assistant
+Created: 2026-10-15
+Description: Tests for incremental parsing of streamed tool arguments
+
+This file is part of the klaude project.
+"""
+
+import pytest
+import sys
+import os
+import json
+
+# Add parent directory to path to import the tools
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.klaude.streaming_args import IncrementalJsonParser
+
+
+class TestIncrementalJsonParser:
+    """Test IncrementalJsonParser"""
+
+    def test_complete_in_one_chunk(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"command": "ls", "timeout": 1000}')
+        assert parser.complete
+        assert parser.result() == {"command": "ls", "timeout": 1000}
+
+    def test_snapshot_while_streaming(self):
+        args = {"file_path": "/tmp/a.py", "edits": [{"old_string": "a}", "new_string": 'b\\"]'}], "n": 2}
+        text = json.dumps(args)
+        parser = IncrementalJsonParser()
+
+        for i in range(len(text)):
+            parser.feed(text[i])
+            snapshot = parser.snapshot()
+            # Every snapshot is a prefix of the final arguments
+            for key, value in snapshot.items():
+                if key != "edits":
+                    assert args[key] == value
+            if i < len(text) - 1:
+                assert not parser.complete
+                assert parser.result() is None
+
+        assert parser.complete
+        assert parser.result() == args
+
+    def test_snapshot_drops_partial_values(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"url": "https://example.com", "prompt": "Summ')
+        assert parser.snapshot() == {"url": "https://example.com"}
+        parser.feed('arize", "items": [1, 2')
+        assert parser.snapshot() == {"url": "https://example.com", "prompt": "Summarize", "items": [1]}
+
+    def test_empty_and_whitespace(self):
+        parser = IncrementalJsonParser()
+        assert parser.snapshot() == {}
+        parser.feed("  ")
+        assert parser.snapshot() == {}
+        parser.feed("{}")
+        assert parser.complete
+        parser.feed("\n")
+        assert parser.result() == {}
+
+    def test_rejects_invalid_structure(self):
+        with pytest.raises(ValueError):
+            IncrementalJsonParser().feed('["not", "an", "object"]')
+        with pytest.raises(ValueError):
+            IncrementalJsonParser().feed('{"a": [1}')
+        parser = IncrementalJsonParser()
+        parser.feed('{"a": 1}')
+        with pytest.raises(ValueError):
+            parser.feed(' {"b": 2}')
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -128,6 +128,23 @@ class TestTodoWriteTool:
         assert tool.todos[0]["content"] == "Updated task"
         assert tool.todos[0]["status"] == "completed"
     
+    def test_todowrite_tool_lookup_and_status_update_by_id(self):
+        tool = TodoWriteTool()
+        tool.execute([
+            {"id": "1", "content": "First task", "status": "pending", "priority": "high"},
+            {"id": "2", "content": "Second task", "status": "pending", "priority": "low"}
+        ])
+        assert tool.get("2")["content"] == "Second task"
+        assert tool.get("missing") is None
+        
+        assert tool.set_status("2", "in_progress")
+        assert tool.todos[1]["status"] == "in_progress"
+        assert not tool.set_status("missing", "completed")
+        
+        with pytest.raises(ValueError):
+            tool.set_status("2", "done")
+        assert tool.todos[1]["status"] == "in_progress"
+    
     def test_todowrite_tool_all_statuses(self):
         tool = TodoWriteTool()
         todos = [
@@ -198,10 +215,10 @@ class TestTodoWriteTool:
                 "priority": "high"
             }
         ]
-        # The tool might validate this and return an error
-        # or it might accept it (depends on implementation)
         result = tool.execute(todos)
-        # Either succeeds or shows error
+        assert result.startswith("Error: Invalid todo at index 0")
+        assert "'status' must be one of" in result
+        assert tool.todos == []
     
     def test_todowrite_tool_missing_fields(self):
         tool = TodoWriteTool()
@@ -214,8 +231,9 @@ class TestTodoWriteTool:
                 # Missing priority
             }
         ]
-        # The tool should handle this gracefully
-        # Either by providing default or showing error
+        result = tool.execute(todos)
+        assert "missing required field 'priority'" in result
+        assert tool.todos == []
     
     def test_todowrite_tool_long_content(self):
         tool = TodoWriteTool()
@@ -9,6 +9,7 @@ This file tests the tool implementations against expected outputs from traces.
 """
 
 import pytest
+import io
 import json
 import os
 import sys
@@ -25,6 +26,7 @@ from src.klaude.tools_impl import (
     EditTool, MultiEditTool, WriteTool, NotebookReadTool, 
     NotebookEditTool, WebFetchTool, TodoWriteTool, WebSearchTool
 )
+from src.klaude.tool_base import ToolRegistry
 
 
 class TestTaskTool:
@@ -140,12 +142,12 @@ class TestGrepTool:
         assert "output_mode" in schema["properties"]
         assert schema["required"] == ["pattern"]
     
-    @patch('subprocess.run')
-    def test_grep_tool_execution_files_mode(self, mock_run):
+    @patch('src.klaude.tools_impl._RG_PATH', 'rg')
+    @patch('subprocess.Popen')
+    def test_grep_tool_execution_files_mode(self, mock_popen):
         # Mock ripgrep output for files_with_matches mode
-        mock_run.return_value = MagicMock(
-            stdout="/path/to/sample.py\n/path/to/test_import.py",
-            stderr="",
+        mock_popen.return_value = MagicMock(
+            stdout=io.StringIO("/path/to/sample.py\n/path/to/test_import.py"),
             returncode=0
         )
         
@@ -154,12 +156,12 @@ class TestGrepTool:
         assert "sample.py" in result
         assert "test_import.py" in result
         
-    @patch('subprocess.run')
-    def test_grep_tool_execution_content_mode(self, mock_run):
+    @patch('src.klaude.tools_impl._RG_PATH', 'rg')
+    @patch('subprocess.Popen')
+    def test_grep_tool_execution_content_mode(self, mock_popen):
         # Mock ripgrep output for content mode
-        mock_run.return_value = MagicMock(
-            stdout="sample.py:1:import os\nsample.py:2:import sys",
-            stderr="",
+        mock_popen.return_value = MagicMock(
+            stdout=io.StringIO("sample.py:1:import os\nsample.py:2:import sys"),
             returncode=0
         )
         
@@ -627,6 +629,35 @@ class TestWebSearchTool:
 
 
 # Integration tests matching trace outputs
+class TestToolRegistry:
+    """Test ToolRegistry schema caching"""
+    
+    def test_schemas_reused_until_register(self):
+        registry = ToolRegistry()
+        registry.register(ReadTool())
+        schemas = registry.get_all_schemas()
+        assert registry.get_all_schemas() is schemas
+        assert [s["function"]["name"] for s in schemas] == ["Read"]
+        
+        registry.register(WriteTool())
+        schemas = registry.get_all_schemas()
+        assert [s["function"]["name"] for s in schemas] == ["Read", "Write"]
+    
+    def test_other_tools_see_pending_notebook_edits(self, tmp_path):
+        path = tmp_path / "nb.ipynb"
+        path.write_text('{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}')
+        registry = ToolRegistry()
+        registry.register(NotebookEditTool())
+        registry.register(ReadTool())
+        
+        registry.execute_tool("NotebookEdit", notebook_path=str(path), new_source="first", edit_mode="insert")
+        registry.execute_tool("NotebookEdit", notebook_path=str(path), new_source="second", edit_mode="insert")
+        # The second edit is still in the debounce window until another tool runs
+        assert "second" not in path.read_text()
+        result = registry.execute_tool("Read", file_path=str(path))
+        assert "first" in result and "second" in result
+
+
 class TestToolsIntegrationWithTraces:
     """Test tools with inputs/outputs matching actual traces"""
     
@@ -188,6 +188,24 @@ if __name__ == "__main__":
             data = json.load(f)
         assert data["name"] == "test"
         assert data["items"] == [1, 2, 3]
+    
+    def test_write_tool_atomic_overwrite(self):
+        tool = WriteTool()
+        test_file = os.path.join(self.temp_dir, "script.sh")
+        with open(test_file, 'w') as f:
+            f.write("old")
+        os.chmod(test_file, 0o750)
+        link = os.path.join(self.temp_dir, "link.sh")
+        os.symlink(test_file, link)
+        
+        result = tool.execute(link, "new")
+        assert "File created successfully" in result
+        assert os.path.islink(link)
+        with open(test_file) as f:
+            assert f.read() == "new"
+        assert os.stat(test_file).st_mode & 0o777 == 0o750
+        # No temporary files are left behind
+        assert sorted(os.listdir(self.temp_dir)) == ["link.sh", "script.sh"]
 
 
 if __name__ == "__main__":